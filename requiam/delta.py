@@ -1,11 +1,135 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import datetime
 import json
 from logging import Logger
-import requests
+import threading
 import time
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 from redata.commons.logger import log_stdout
+from requests.exceptions import RequestException
+
+from .journal import SyncJournal
+from .membership import Members, difference, intersection, member_list
+from .transport import GrouperTransport
+
+
+# Per-subject result codes that are not retried
+permanent_codes = ['SUBJECT_NOT_FOUND', 'SUBJECT_DUPLICATE']
+
+
+def parse_subject_results(rsp_j: Dict[str, Any], batch: List[str]) \
+        -> Dict[str, str]:
+    """
+    Return the result code of each subject in a ``WsAddMemberResults`` or
+    ``WsDeleteMemberResults`` response. Subjects without a per-subject
+    result are given the batch result code
+
+    :param rsp_j: Grouper ``WsAddMemberResults`` or ``WsDeleteMemberResults``
+    :param batch: Member IDs sent in the batch
+
+    :return: Result code for each member ID
+    """
+
+    batch_code = rsp_j['resultMetadata']['resultCode']
+    subject_codes = {member: batch_code for member in batch}
+
+    for n, result in enumerate(rsp_j.get('results', [])):
+        subject = result.get('wsSubject', {})
+        member = subject.get('id')
+        if member is None and n < len(batch):
+            member = batch[n]
+        if member in subject_codes:
+            code = result.get('resultMetadata', {}).get('resultCode',
+                                                        subject.get('resultCode'))
+            subject_codes[member] = code if code else batch_code
+
+    return subject_codes
+
+
+class AdaptiveBatchSize:
+    """
+    This class chooses Grouper batch sizes with additive-increase,
+    multiplicative-decrease (AIMD). The size grows by ``increase`` after a
+    successful batch request that finishes within ``target_time`` and is
+    multiplied by ``decrease`` after a slow or unsuccessful request, within
+    ``min_size`` and ``max_size``. Each attempt of a retried request is
+    recorded
+
+    :param initial: Initial batch size
+    :param min_size: Minimum batch size
+    :param max_size: Maximum batch size
+    :param target_time: Target batch time in seconds
+    :param increase: Additive increase. Default: ``min_size``
+    :param decrease: Multiplicative decrease. Default: 0.5
+
+    :ivar size: Current batch size
+    :ivar sizes: Batch sizes of the recorded requests
+    """
+
+    def __init__(self, initial: int, min_size: int, max_size: int,
+                 target_time: float, increase: Optional[int] = None,
+                 decrease: float = 0.5) -> None:
+
+        self.min_size = max(min_size, 1)
+        self.max_size = max(max_size, self.min_size)
+        self.target_time = target_time
+        self.increase = increase if increase else self.min_size
+        self.decrease = decrease
+
+        self.size: int = min(max(initial, self.min_size), self.max_size)
+        self.sizes: List[int] = []
+
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, batch_size: int, batch_timeout: int,
+                      batch_min_size: int = 1, batch_max_size: int = 0,
+                      batch_target_time: float = 0,
+                      **kwargs) -> 'AdaptiveBatchSize':
+        """
+        Construct an AdaptiveBatchSize from :class:`Delta` settings. It can
+        be shared by the Delta objects of a Grouper with its ``batch_sizer``
+        so that the batch size carries over between groups
+
+        :param batch_size: Initial batch size
+        :param batch_timeout: Timeout in seconds for each batch
+        :param batch_min_size: Minimum batch size. Default: 1
+        :param batch_max_size: Maximum batch size. Default: ``batch_size``
+        :param batch_target_time: Target batch time in seconds.
+               Default: half of ``batch_timeout``
+        :param kwargs: Other :class:`Delta` settings, not used
+
+        :return: ``AdaptiveBatchSize`` object
+        """
+
+        return cls(batch_size, batch_min_size,
+                   batch_max_size if batch_max_size else batch_size,
+                   batch_target_time if batch_target_time else batch_timeout / 2)
+
+    def next_size(self) -> int:
+        """
+        Return the size of the next batch
+        """
+
+        with self._lock:
+            return self.size
+
+    def record(self, size: int, batch_time: float, success: bool) -> None:
+        """
+        Update the batch size from a completed batch request
+
+        :param size: Number of members in the batch
+        :param batch_time: Request time in seconds
+        :param success: Bool for a successful HTTP status
+        """
+
+        with self._lock:
+            self.sizes.append(size)
+            if success and batch_time <= self.target_time:
+                self.size = min(self.size + self.increase, self.max_size)
+            else:
+                self.size = max(int(self.size * self.decrease), self.min_size)
 
 
 class Delta:
@@ -20,13 +144,43 @@ class Delta:
     Usage:
        ``from requiam import delta``
 
+    Members can be provided as sets or as compact arrays from
+    :func:`requiam.membership.to_member_array`. With arrays, ``adds``,
+    ``drops`` and ``common`` are computed with vectorized ``numpy`` set
+    routines and are returned as arrays
+
     :param ldap_members: Set of LDAP member ID
     :param grouper_query_dict: Result from ``Grouper``
     :param batch_size: Number of records to synchronization for each "batch"
     :param batch_timeout: Timeout in seconds for each batch
-    :param batch_delay: Delay between batches in seconds
+    :param batch_delay: Delay between batches in seconds. Only used when the
+           Grouper transport has no rate limit (``grouper_rate_limit``)
     :param sync_max: Maximum total adds and drops for synchronization
     :param log: Logger object
+    :param max_in_flight: Maximum number of batches submitted concurrently.
+           Drops are completed before adds. ``batch_delay`` is not used with
+           concurrent batches. Default: 1
+    :param batch_adaptive: Bool to choose batch sizes with
+           :class:`AdaptiveBatchSize`, starting from ``batch_size``. The
+           ``batch_sizer`` of ``grouper_query_dict`` is used when available.
+           Default: ``False``
+    :param batch_min_size: Minimum adaptive batch size. Default: 1
+    :param batch_max_size: Maximum adaptive batch size.
+           Default: ``batch_size``
+    :param batch_target_time: Target adaptive batch time in seconds.
+           Default: half of ``batch_timeout``
+    :param batch_retries: Maximum number of times failed members are
+           re-sent. Default: 2
+    :param batch_retry_size: Batch size for failed members.
+           Default: a quarter of ``batch_size``
+    :param journal: :class:`requiam.journal.SyncJournal` that records the
+           planned and acknowledged drops and adds. Default: ``None``
+    :param replace_threshold: Share of the Grouper membership above which
+           adds and drops are replaced with :meth:`replace_batch` instead of
+           batches. 0 disables replacement. Default: 0
+    :param replace_batch_size: Number of members in each replacement
+           request. The first request holds at least all ``common`` members.
+           Default: the whole new membership in one request
 
     :ivar ldap_members: Set of LDAP member IDs
     :ivar grouper_query_dict: Result from ``Grouper``
@@ -36,14 +190,37 @@ class Delta:
     :ivar batch_delay: Delay between batches in seconds
     :ivar sync_max: Maximum total adds and drops for synchronization
     :ivar log: Logger object
+    :ivar max_in_flight: Maximum number of batches submitted concurrently
+    :ivar batch_sizer: :class:`AdaptiveBatchSize` with ``batch_adaptive``,
+          shared with other groups when provided in ``grouper_query_dict``
+    :ivar batch_sizes: Sizes of the batches sent by :meth:`synchronize`
+    :ivar succeeded: Member IDs that were dropped or added, for
+          'drop' and 'add'
+    :ivar failed: Result code of member IDs that could not be dropped or
+          added, for 'drop' and 'add'
+    :ivar synced: Whether :meth:`synchronize` completed without failed
+          members
+    :ivar journal: :class:`requiam.journal.SyncJournal` object
+    :ivar replace_threshold: Share of the Grouper membership above which
+          membership is replaced
+    :ivar replace_batch_size: Number of members in each replacement request
     :ivar adds: Set of members to add to Grouper group
     :ivar drops: Set of members to drop from Grouper group
     :ivar common: Set of members in common with EDS/LDAP and Grouper
+    :ivar transport: :class:`requiam.transport.GrouperTransport` from
+          ``grouper_query_dict``. A new one is created if not provided
     """
 
-    def __init__(self, ldap_members: set, grouper_query_dict: Dict[str, Any],
+    def __init__(self, ldap_members: Members, grouper_query_dict: Dict[str, Any],
                  batch_size: int, batch_timeout: int, batch_delay: int,
-                 sync_max: int, log: Optional[Logger] = None) -> None:
+                 sync_max: int, log: Optional[Logger] = None,
+                 max_in_flight: int = 1, batch_adaptive: bool = False,
+                 batch_min_size: int = 1, batch_max_size: int = 0,
+                 batch_target_time: float = 0, batch_retries: int = 2,
+                 batch_retry_size: int = 0,
+                 journal: Optional[SyncJournal] = None,
+                 replace_threshold: float = 0,
+                 replace_batch_size: int = 0) -> None:
 
         if isinstance(log, type(None)):
             self.log = log_stdout()
@@ -52,13 +229,39 @@ class Delta:
 
         self.log.debug('entered')
 
-        self.ldap_members: set = ldap_members
+        self.ldap_members: Members = ldap_members
         self.grouper_query_dict: Dict[str, Any] = grouper_query_dict
-        self.grouper_members: set = grouper_query_dict['members']
+        self.grouper_members: Members = grouper_query_dict['members']
         self.batch_size: int = batch_size
         self.batch_timeout: int = batch_timeout
         self.batch_delay: int = batch_delay
         self.sync_max: int = sync_max
+        self.max_in_flight: int = max_in_flight
+
+        self.batch_sizer: Optional[AdaptiveBatchSize] = None
+        if batch_adaptive:
+            self.batch_sizer = grouper_query_dict.get('batch_sizer')
+            if self.batch_sizer is None:
+                self.batch_sizer = AdaptiveBatchSize.from_settings(
+                    batch_size, batch_timeout, batch_min_size, batch_max_size,
+                    batch_target_time)
+        self.batch_sizes: List[int] = []
+
+        self.batch_retries: int = batch_retries
+        self.batch_retry_size: int = batch_retry_size if batch_retry_size \
+            else max(batch_size // 4, 1)
+        self.succeeded: Dict[str, List[str]] = {'drop': [], 'add': []}
+        self.failed: Dict[str, Dict[str, str]] = {'drop': dict(), 'add': dict()}
+        self._results_lock = threading.Lock()
+        self.synced: bool = False
+
+        self.journal: Optional[SyncJournal] = journal
+
+        self.replace_threshold: float = float(replace_threshold)
+        self.replace_batch_size: int = replace_batch_size
+
+        self.transport: Optional[GrouperTransport] = \
+            grouper_query_dict.get('transport')
 
         self.drops = self._drops()
         self.adds = self._adds()
@@ -67,109 +270,423 @@ class Delta:
         self.log.debug('returning')
         return
 
-    def _common(self) -> set:
-        common = self.ldap_members & self.grouper_members
+    @classmethod
+    def from_plan(cls, plan: Dict[str, Any], grouper_query_dict: Dict[str, Any],
+                  **kwargs) -> 'Delta':
+        """
+        Construct a Delta from planned drops and adds, e.g. from
+        :meth:`requiam.journal.SyncJournal.pending` or
+        :meth:`requiam.sync_plan.SyncPlan.load`, without EDS or Grouper
+        queries
+
+        :param plan: Dict with 'group', 'members_url', 'drops' and 'adds'
+        :param grouper_query_dict: Grouper settings, e.g. ``vars(Grouper)``
+        :param kwargs: Other :class:`Delta` parameters
+
+        :return: ``Delta`` object
+        """
+
+        query_dict = dict(grouper_query_dict)
+        query_dict['grouper_group'] = plan['group']
+        query_dict['grouper_members_url'] = plan['members_url']
+        query_dict['members'] = set(plan['drops'])
+
+        # Unchanged members are not planned, so membership cannot be replaced
+        kwargs['replace_threshold'] = 0
+
+        return cls(ldap_members=set(plan['adds']), grouper_query_dict=query_dict,
+                   **kwargs)
+
+    def _common(self) -> Members:
+        common = intersection(self.ldap_members, self.grouper_members)
 
         self.log.debug('finished common')
         return common
 
-    def _adds(self) -> set:
-        adds = self.ldap_members - self.grouper_members
+    def _adds(self) -> Members:
+        adds = difference(self.ldap_members, self.grouper_members)
 
         self.log.debug('finished adds')
         return adds
 
-    def _drops(self) -> set:
-        drops = self.grouper_members - self.ldap_members
+    def _drops(self) -> Members:
+        drops = difference(self.grouper_members, self.ldap_members)
 
         self.log.debug('finished drops')
         return drops
 
-    def synchronize(self) -> None:
-        self.log.debug('entered')
+    def _get_transport(self) -> GrouperTransport:
+        if self.transport is None:
+            self.transport = GrouperTransport((self.grouper_query_dict['grouper_user'],
+                                               self.grouper_query_dict['grouper_password']),
+                                              log=self.log)
+        return self.transport
+
+    def batches(self, members: Members) -> List[List[str]]:
+        """
+        Split members into batches of ``batch_size``
 
-        total_delta = len(list(self.adds)) + len(list(self.drops))
+        :param members: ``adds`` or ``drops``
+
+        :return: List of batches of member IDs
+        """
+
+        list_of_members = member_list(members)
+        return [list_of_members[i:i + self.batch_size] for
+                i in range(0, len(list_of_members), self.batch_size)]
+
+    def sync_ready(self) -> bool:
+        """
+        Check ``sync_max`` and log synchronization settings
+
+        :return: ``True`` if synchronization can proceed
+        """
+
+        total_delta = len(self.adds) + len(self.drops)
         if total_delta > self.sync_max:
             self.log.warning(f"total delta ({total_delta}) exceeds maximum " +
                              f"sync limit ({self.sync_max}), will not synchronize")
-            self.log.debug('finished synchronize')
-            return
+            return False
 
         self.log.info("synchronizing ldap query results to " +
                       f"{self.grouper_query_dict['grouper_group']}")
-        self.log.info(f"batch size = {self.batch_size}, " +
+        limiter = self._get_transport().limiter
+        if limiter.enabled:
+            throttle = f"rate limit = {limiter.rate} requests/second"
+        else:
+            throttle = f"batch delay = {self.batch_delay} seconds"
+        if self.batch_sizer:
+            batch_size = f"adaptive batch size = {self.batch_sizer.size} " + \
+                f"({self.batch_sizer.min_size}-{self.batch_sizer.max_size})"
+        else:
+            batch_size = f"batch size = {self.batch_size}"
+        self.log.info(f"{batch_size}, " +
                       f"batch timeout = {self.batch_timeout} seconds, " +
-                      f"batch delay = {self.batch_delay} seconds")
-
-        self.log.info('processing drops:')
-        n_batches = 0
-        list_of_drops = list(self.drops)
-        for batch in [list_of_drops[i:i + self.batch_size] for
-                      i in range(0, len(list_of_drops), self.batch_size)]:
-            n_batches += 1
-
-            data = dict()
-            data['WsRestDeleteMemberRequest'] = {
-                'subjectLookups': [{'subjectId': entry} for entry in batch]
-            }
-
-            start_t = datetime.datetime.now()
-            rsp = requests.post(self.grouper_query_dict['grouper_members_url'],
-                                auth=(self.grouper_query_dict['grouper_user'],
-                                      self.grouper_query_dict['grouper_password']),
+                      throttle)
+        return True
+
+    def journal_plan(self) -> None:
+        """
+        Record the planned drops and adds in ``journal``
+        """
+
+        if self.journal:
+            self.journal.plan(self.grouper_query_dict['grouper_group'],
+                              self.grouper_query_dict['grouper_members_url'],
+                              member_list(self.drops), member_list(self.adds))
+
+    def journal_done(self) -> None:
+        """
+        Record the completion of the group in ``journal``
+        """
+
+        if self.journal:
+            self.journal.done(self.grouper_query_dict['grouper_group'])
+
+    def _pause(self) -> None:
+        # batch_delay only applies without a shared rate limit
+        if self.batch_delay > 0 and not self._get_transport().limiter.enabled:
+            self.log.info(f"pausing for {self.batch_delay} seconds")
+            time.sleep(self.batch_delay)
+
+    def drop_batch(self, batch: List[str], n_batch: int) -> Dict[str, Any]:
+        """
+        Send a batch of drops to Grouper with ``WsRestDeleteMemberRequest``
+
+        :param batch: Member IDs to drop
+        :param n_batch: Batch number for logging
+
+        :return: Grouper ``WsDeleteMemberResults``
+        """
+
+        return self._member_batch('drop', batch, n_batch)
+
+    def add_batch(self, batch: List[str], n_batch: int) -> Dict[str, Any]:
+        """
+        Send a batch of adds to Grouper with ``WsRestAddMemberRequest``
+
+        :param batch: Member IDs to add
+        :param n_batch: Batch number for logging
+
+        :return: Grouper ``WsAddMemberResults``
+        """
+
+        return self._member_batch('add', batch, n_batch)
+
+    def _member_batch(self, action: str, batch: List[str],
+                      n_batch: int) -> Dict[str, Any]:
+        transport = self._get_transport()
+
+        if action == 'drop':
+            request_key, results_key = 'WsRestDeleteMemberRequest', 'WsDeleteMemberResults'
+            send, problem, done = transport.post, 'delete', 'dropped'
+        else:
+            request_key, results_key = 'WsRestAddMemberRequest', 'WsAddMemberResults'
+            send, problem, done = transport.put, 'add', 'added'
+
+        data = dict()
+        data[request_key] = {
+            'subjectLookups': [{'subjectId': entry} for entry in batch]
+        }
+
+        def record(attempt_t: float, status: Optional[int]) -> None:
+            # Each attempt is recorded, so retried batches shrink the size
+            self.batch_sizer.record(len(batch), attempt_t, status == 200)
+
+        start_t = datetime.datetime.now()
+        try:
+            rsp = send(self.grouper_query_dict['grouper_members_url'],
+                       data=json.dumps(data),
+                       headers={'Content-type': 'text/x-json'},
+                       timeout=self.batch_timeout, write=True, idempotent=True,
+                       on_attempt=record if self.batch_sizer else None)
+            rsp_j = rsp.json()[results_key]
+        except (RequestException, ValueError, KeyError) as err:
+            # Transport errors after retries, or a response without results
+            self.log.warning(f"batch {problem} failed : {err}")
+            rsp_j = {'resultMetadata': {'resultCode': 'EXCEPTION',
+                                        'resultMessage': str(err)}}
+        end_t = datetime.datetime.now()
+        batch_t = (end_t - start_t).total_seconds()
+
+        result_code = rsp_j['resultMetadata']['resultCode']
+        subject_codes = parse_subject_results(rsp_j, batch)
+        succeeded = [member for member, code in subject_codes.items()
+                     if code.startswith('SUCCESS')]
+        with self._results_lock:
+            self.succeeded[action].extend(succeeded)
+            for member, code in subject_codes.items():
+                if not code.startswith('SUCCESS'):
+                    self.failed[action][member] = code
+        if self.journal:
+            self.journal.ack(self.grouper_query_dict['grouper_group'], action,
+                             succeeded)
+
+        self.batch_sizes.append(len(batch))
+        if result_code not in 'SUCCESS':
+            self.log.warning(f'problem running batch {problem}, result code = %s',
+                             result_code)
+        else:
+            self.log.info(f"{done} batch {n_batch}, " +
+                          f"{len(batch)} entries, " +
+                          f"{batch_t} seconds")
+
+        return rsp_j
+
+    def replace_ready(self) -> bool:
+        """
+        Check whether adds and drops exceed ``replace_threshold`` of the
+        Grouper membership
+
+        :return: ``True`` if membership is replaced by :meth:`synchronize`
+        """
+
+        if not self.replace_threshold or \
+                len(self.common) + len(self.adds) == 0:
+            return False
+
+        total_delta = len(self.adds) + len(self.drops)
+        return total_delta > self.replace_threshold * len(self.grouper_members)
+
+    def replace_batch(self, batch: List[str]) -> bool:
+        """
+        Replace the membership of the Grouper group with ``batch`` using
+        ``WsRestAddMemberRequest`` and ``replaceAllExisting``
+
+        :param batch: Member IDs of the new membership
+
+        :return: ``True`` if Grouper replaced the membership
+        """
+
+        transport = self._get_transport()
+
+        data = dict()
+        data['WsRestAddMemberRequest'] = {
+            'replaceAllExisting': 'T',
+            'subjectLookups': [{'subjectId': entry} for entry in batch]
+        }
+
+        start_t = datetime.datetime.now()
+        try:
+            rsp = transport.put(self.grouper_query_dict['grouper_members_url'],
                                 data=json.dumps(data),
                                 headers={'Content-type': 'text/x-json'},
-                                timeout=self.batch_timeout)
-            end_t = datetime.datetime.now()
-            batch_t = (end_t - start_t).total_seconds()
-
-            rsp_j = rsp.json()
-            if rsp_j['WsDeleteMemberResults']['resultMetadata']['resultCode'] not in 'SUCCESS':
-                self.log.warning('problem running batch delete, result code = %s',
-                                 rsp_j['WsDeleteMemberResults']['resultMetadata']['resultCode'])
-            else:
-                self.log.info(f"dropped batch {n_batches}, " +
-                              f"{len(batch)} entries, " +
-                              f"{batch_t} seconds")
-
-            if self.batch_delay > 0:
-                self.log.info(f"pausing for {self.batch_delay} seconds")
-                time.sleep(self.batch_delay)
-
-        self.log.info('processing adds:')
-        n_batches = 0
-        list_of_adds = list(self.adds)
-        for batch in [list_of_adds[i:i + self.batch_size] for
-                      i in range(0, len(list_of_adds), self.batch_size)]:
-            n_batches += 1
-
-            data = dict()
-            data['WsRestAddMemberRequest'] = {
-                'subjectLookups': [{'subjectId': entry} for entry in batch]
-            }
-
-            start_t = datetime.datetime.now()
-            rsp = requests.put(self.grouper_query_dict['grouper_members_url'],
-                               auth=(self.grouper_query_dict['grouper_user'],
-                                     self.grouper_query_dict['grouper_password']),
-                               data=json.dumps(data),
-                               headers={'Content-type': 'text/x-json'},
-                               timeout=self.batch_timeout)
-            end_t = datetime.datetime.now()
-            batch_t = (end_t - start_t).total_seconds()
-
-            rsp_j = rsp.json()
-            if rsp_j['WsAddMemberResults']['resultMetadata']['resultCode'] not in 'SUCCESS':
-                self.log.warning('problem running batch add, result code = %s',
-                                 rsp_j['WsAddMemberResults']['resultMetadata']['resultCode'])
-            else:
-                self.log.info(f"added batch {n_batches}, " +
-                              f"{len(batch)} entries, " +
-                              f"{batch_t} seconds")
+                                timeout=self.batch_timeout, write=True, idempotent=True)
+            rsp_j = rsp.json()['WsAddMemberResults']
+        except (RequestException, ValueError, KeyError) as err:
+            self.log.warning(f"replace failed : {err}")
+            return False
+        end_t = datetime.datetime.now()
+        batch_t = (end_t - start_t).total_seconds()
+
+        self.batch_sizes.append(len(batch))
+        result_code = rsp_j['resultMetadata']['resultCode']
+        if result_code != 'SUCCESS':
+            self.log.warning('problem running replace, result code = %s',
+                             result_code)
+            return False
+
+        self.log.info(f"replaced membership, {len(batch)} entries, " +
+                      f"{batch_t} seconds")
+        return True
+
+    def _replace(self) -> bool:
+        # The replacing request holds every unchanged member, so an
+        # interrupted run only leaves adds pending in the journal
+        common = member_list(self.common)
+        adds = member_list(self.adds)
+        n_adds = max(self.replace_batch_size - len(common), 0) \
+            if self.replace_batch_size else len(adds)
+
+        self.log.info(f"replacing membership: {len(self.drops)} drops, " +
+                      f"{len(adds)} adds, {len(common)} unchanged")
+        if not self.replace_batch(common + adds[:n_adds]):
+            return False
+
+        drops = member_list(self.drops)
+        with self._results_lock:
+            self.succeeded['drop'].extend(drops)
+            self.succeeded['add'].extend(adds[:n_adds])
+        if self.journal:
+            self.journal.ack(self.grouper_query_dict['grouper_group'], 'drop', drops)
+            self.journal.ack(self.grouper_query_dict['grouper_group'], 'add',
+                             adds[:n_adds])
+
+        if adds[n_adds:]:
+            self._pause()
+            self.log.info('processing remaining adds:')
+            self._submit_batches(self.add_batch, adds[n_adds:],
+                                 batch_size=self.replace_batch_size)
+            self._retry_failed('add', self.add_batch)
+        return True
+
+    def next_batch_size(self) -> int:
+        """
+        Return the size of the next batch
+
+        :return: Size from ``batch_sizer`` or ``batch_size``
+        """
+
+        if self.batch_sizer:
+            return self.batch_sizer.next_size()
+        return self.batch_size
+
+    def take_retry_members(self, action: str, n_retry: int) -> List[str]:
+        """
+        Remove the failed members that can be re-sent from ``failed``
+
+        :param action: 'drop' or 'add'
+        :param n_retry: Retry number for logging
+
+        :return: Member IDs to re-send
+        """
+
+        retry_members = sorted(member for member, code in self.failed[action].items()
+                               if code not in permanent_codes)
+        if retry_members:
+            self.log.info(f"retrying {len(retry_members)} failed {action}s " +
+                          f"(retry {n_retry}/{self.batch_retries})")
+            for member in retry_members:
+                del self.failed[action][member]
+
+        return retry_members
+
+    def _retry_failed(self, action: str, send) -> None:
+        # Re-send only the failed members, in smaller batches
+        for n_retry in range(1, self.batch_retries + 1):
+            retry_members = self.take_retry_members(action, n_retry)
+            if not retry_members:
+                return
+
+            self._submit_batches(send, retry_members,
+                                 batch_size=self.batch_retry_size)
+
+    def _submit_batches(self, send, members: Members,
+                        batch_size: Optional[int] = None) -> None:
+        # Batches are sliced as they are submitted so adaptive sizes apply
+        list_of_members = member_list(members)
+        start = 0
+        n_batch = 0
+
+        if self.max_in_flight <= 1:
+            while start < len(list_of_members):
+                size = batch_size if batch_size else self.next_batch_size()
+                n_batch += 1
+                send(list_of_members[start:start + size], n_batch)
+                start += size
+                self._pause()
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            in_flight = set()
+            while start < len(list_of_members) or in_flight:
+                while start < len(list_of_members) and \
+                        len(in_flight) < self.max_in_flight:
+                    size = batch_size if batch_size else self.next_batch_size()
+                    n_batch += 1
+                    in_flight.add(executor.submit(send, list_of_members[start:start + size],
+                                                  n_batch))
+                    start += size
+
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+
+    def batch_size_summary(self) -> str:
+        """
+        Summarize the sizes of the batches sent by :meth:`synchronize`
+
+        :return: Batch sizes in order, e.g. '400,450,225'
+        """
+
+        return ','.join(str(size) for size in self.batch_sizes)
+
+    def sync_done(self) -> None:
+        """
+        Report the members that could not be dropped or added, record the
+        completion of the group in ``journal`` and log the batch sizes
+        """
+
+        for action in ['drop', 'add']:
+            if self.failed[action]:
+                self.log.warning(f"{len(self.failed[action])} {action}s failed : " +
+                                 ", ".join(f"{member} ({code})" for member, code in
+                                           sorted(self.failed[action].items())))
+
+        self.synced = not (self.failed['drop'] or self.failed['add'])
+        self.journal_done()
+        self.log.info(f"batch sizes : {self.batch_size_summary()}")
+
+    def synchronize(self) -> None:
+        self.log.debug('entered')
+
+        if not self.sync_ready():
+            self.log.debug('finished synchronize')
+            return
+
+        self.journal_plan()
+
+        # Heavily changed groups are replaced in a few requests. Batches are
+        # used if the replacement is rejected
+        replaced = False
+        if self.replace_ready():
+            replaced = self._replace()
+            if not replaced:
+                self.log.warning("falling back to batches")
+
+        if not replaced:
+            if self.max_in_flight > 1:
+                self.log.info(f"submitting up to {self.max_in_flight} batches concurrently")
+
+            self.log.info('processing drops:')
+            self._submit_batches(self.drop_batch, self.drops)
+            self._retry_failed('drop', self.drop_batch)
+
+            self.log.info('processing adds:')
+            self._submit_batches(self.add_batch, self.adds)
+            self._retry_failed('add', self.add_batch)
 
-            if self.batch_delay > 0:
-                self.log.info(f"pausing for {self.batch_delay} seconds")
-                time.sleep(self.batch_delay)
+        self.sync_done()
 
         self.log.debug('finished synchronize')
         return
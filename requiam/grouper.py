@@ -1,13 +1,14 @@
+import codecs
+import json
 from logging import Logger
 from os.path import join
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
 import requests
-import pandas as pd
-
-from requests.exceptions import HTTPError
 
 from .commons import figshare_stem, figshare_group
-from .delta import Delta
+from .delta import AdaptiveBatchSize, Delta
+from .membership import to_member_array
+from .transport import GrouperTransport
 
 from redata.commons.logger import log_stdout
 
@@ -18,6 +19,116 @@ superadmins = figshare_group('GrouperSuperAdmins', '', production=True)
 admins = figshare_group('GrouperAdmins', '', production=True)
 managers = figshare_group('GrouperManagers', '', production=True)
 
+# Size of streamed chunks for Grouper member retrieval
+stream_chunk_size = 65536
+
+# Grouper access privileges and successful assignment result codes
+allowed_privileges = ['read', 'view', 'update', 'admin', 'optin', 'optout']
+privilege_success = ['SUCCESS', 'SUCCESS_ALLOWED', 'SUCCESS_ALLOWED_ALREADY_EXISTED']
+
+
+def iter_subject_ids(chunks: Iterable[bytes], key: str = 'wsSubjects',
+                     metadata: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+    """
+    Incrementally parse a Grouper JSON response and yield the ``id`` of
+    each subject in the ``key`` array.
+
+    Only the unparsed tail of the stream and one subject at a time are kept
+    in memory, so the full response body is never materialized or decoded
+    more than once
+
+    :param chunks: Iterable of raw response chunks
+           (e.g., ``requests.Response.iter_content``)
+    :param key: Name of the JSON array containing the subjects.
+           Default: 'wsSubjects'
+    :param metadata: ``dict`` that is updated with the ``resultMetadata``
+           outside of the subject array. The rest of the stream is then read
+           after the subject array. Default: ``None``
+
+    :raises ValueError: If the stream ends inside the subject array
+
+    :return: Iterator of subject IDs
+    """
+
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    token = f'"{key}"'
+    meta_token = '"resultMetadata"'
+    find_meta = metadata is not None
+
+    buffer = ''
+    state = 'key'  # 'key' -> 'array' -> 'subjects' -> 'done'
+
+    def read_metadata() -> None:
+        # Decode resultMetadata ahead of or after the subject array
+        nonlocal buffer, find_meta
+        idx = buffer.find(meta_token)
+        if idx < 0:
+            return
+        if state == 'key' and 0 <= buffer.find(token) < idx:
+            return
+        try:
+            meta, end = decoder.raw_decode(buffer,
+                                           buffer.index('{', idx + len(meta_token)))
+        except ValueError:
+            return  # Incomplete metadata, wait for more data
+        metadata.update(meta)
+        find_meta = False
+        buffer = buffer[end:]
+
+    for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+
+        if find_meta and state == 'key':
+            read_metadata()
+
+        if state == 'key':
+            idx = buffer.find(token)
+            if idx < 0:
+                # Keep enough characters to match a token split across chunks,
+                # or the incomplete metadata
+                meta_idx = buffer.find(meta_token) if find_meta else -1
+                if meta_idx < 0:
+                    buffer = buffer[-max(len(token), len(meta_token)):]
+                continue
+            buffer = buffer[idx + len(token):]
+            state = 'array'
+
+        if state == 'array':
+            idx = buffer.find('[')
+            if idx < 0:
+                continue
+            buffer = buffer[idx + 1:]
+            state = 'subjects'
+
+        if state == 'subjects':
+            pos = 0
+            while True:
+                while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                    pos += 1
+                if pos == len(buffer):
+                    break
+                if buffer[pos] == ']':
+                    state = 'done'
+                    break
+                try:
+                    subject, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    break  # Incomplete subject, wait for more data
+                yield subject['id']
+            buffer = buffer[pos:]
+
+        if state == 'done':
+            if find_meta:
+                read_metadata()
+            if not find_meta:
+                return
+            if buffer.find(meta_token) < 0:
+                buffer = buffer[-len(meta_token):]
+
+    if state in ['array', 'subjects']:
+        raise ValueError(f"Incomplete Grouper response in [{key}]")
+
 
 class Grouper:
     """
@@ -33,6 +144,30 @@ class Grouper:
     :param grouper_password: Grouper password credential
     :param grouper_production: Bool to use production stem, ``figshare``.
            Otherwise stage stem is used, ``figtest``. Default: production
+    :param grouper_pool_size: Number of pooled HTTPS connections. Default: 10
+    :param grouper_timeout: Default timeout in seconds for each Grouper call.
+           Default: 120
+    :param grouper_page_size: Number of members per page for :meth:`query`.
+           Default: 0 (all members in a single streamed response)
+    :param grouper_query_chunk: Number of groups per request for
+           :meth:`query_many`. Default: 20
+    :param grouper_rate_limit: Grouper requests per second, shared by all
+           calls including :class:`requiam.delta.Delta` batches.
+           Default: 0 (unlimited)
+    :param grouper_rate_burst: Number of Grouper requests allowed in a burst.
+           Default: 1
+    :param grouper_max_writes: Maximum number of concurrent Grouper updates.
+           Default: 0 (unlimited)
+    :param grouper_max_retries: Maximum number of retries of a Grouper call.
+           Default: 3
+    :param grouper_backoff: Base delay in seconds for jittered exponential
+           backoff between retries. Default: 1
+    :param grouper_deadline: Maximum time in seconds for a Grouper call,
+           including retries. Default: 600
+    :param grouper_breaker_threshold: Share of failed Grouper calls that
+           stops further calls. 0 disables it. Default: 0.5
+    :param grouper_breaker_cooldown: Seconds before Grouper calls are tried
+           again after they were stopped. Default: 60
 
     :ivar grouper_host: Grouper hostname
     :ivar grouper_base_path: Grouper base path that includes the API version
@@ -43,12 +178,34 @@ class Grouper:
     :ivar tuple grouper_auth: Grouper credential
     :ivar str endpoint: Grouper endpoint
     :ivar dict headers: HTTPS header information
+    :ivar transport: :class:`requiam.transport.GrouperTransport` shared with
+          the :class:`requiam.delta.Delta` objects created from :meth:`query`
+    :ivar grouper_page_size: Number of members per page for :meth:`query`
+    :ivar grouper_query_chunk: Number of groups per request for
+          :meth:`query_many`
+    :ivar batch_sizer: :class:`requiam.delta.AdaptiveBatchSize` shared with
+          the :class:`requiam.delta.Delta` objects created from :meth:`query`
+          with ``batch_adaptive``. Default: ``None`` (one for each Delta)
+    :ivar dict group_index: Cached stem listings from :meth:`get_group_index`
+    :ivar dict subject_uuids: Cached group UUIDs from :meth:`get_group_uuid`
     """
 
     def __init__(self, grouper_host: str, grouper_base_path: str,
                  grouper_user: str, grouper_password: str,
                  grouper_production: bool = False,
-                 log: Optional[Logger] = None):
+                 log: Optional[Logger] = None,
+                 grouper_pool_size: int = 10,
+                 grouper_timeout: int = 120,
+                 grouper_page_size: int = 0,
+                 grouper_query_chunk: int = 20,
+                 grouper_rate_limit: float = 0,
+                 grouper_rate_burst: int = 1,
+                 grouper_max_writes: int = 0,
+                 grouper_max_retries: int = 3,
+                 grouper_backoff: float = 1,
+                 grouper_deadline: float = 600,
+                 grouper_breaker_threshold: float = 0.5,
+                 grouper_breaker_cooldown: float = 60):
 
         if isinstance(log, type(None)):
             self.log = log_stdout()
@@ -65,6 +222,25 @@ class Grouper:
         self.endpoint: str = f'https://{grouper_host}/{grouper_base_path}'
         self.headers: dict = {'Content-Type': 'text/x-json'}
 
+        self.transport = GrouperTransport(self.grouper_auth,
+                                          pool_size=grouper_pool_size,
+                                          timeout=grouper_timeout,
+                                          log=self.log,
+                                          rate_limit=grouper_rate_limit,
+                                          rate_burst=grouper_rate_burst,
+                                          max_writes=grouper_max_writes,
+                                          max_retries=grouper_max_retries,
+                                          backoff=grouper_backoff,
+                                          deadline=grouper_deadline,
+                                          breaker_threshold=grouper_breaker_threshold,
+                                          breaker_cooldown=grouper_breaker_cooldown)
+        self.grouper_page_size = grouper_page_size
+        self.grouper_query_chunk = grouper_query_chunk
+        self.batch_sizer: Optional[AdaptiveBatchSize] = None
+
+        self.group_index: Dict[str, Optional[Dict[str, Dict[str, dict]]]] = dict()
+        self.subject_uuids: Dict[str, str] = dict()
+
     def url(self, endpoint: str) -> str:
         """
         Return full Grouper URL endpoint
@@ -76,34 +252,204 @@ class Grouper:
 
         return join(self.endpoint, endpoint)
 
-    def query(self, group: str) -> Dict[str, Any]:
+    def query(self, group: str, as_array: bool = False,
+              page_size: Optional[int] = None) -> Dict[str, Any]:
         """
         Query Grouper for list of members in a group.
 
+        Members are streamed from the response with :func:`iter_subject_ids`.
+        With ``page_size``, members are retrieved in pages using the
+        ``pageSize`` and ``pageNumber`` parameters of
+        `Grouper API "Get Members"
+        <https://spaces.at.internet2.edu/display/Grouper/Get+Members>`_
+
         :param group: Grouper full group path from
                :func:`requiam.commons.figshare_group`
+        :param as_array: Return members as a compact array from
+               :func:`requiam.membership.to_member_array`.
+               Default: ``False`` (set)
+        :param page_size: Number of members per page.
+               Default: ``self.grouper_page_size``. 0 disables paging
+
+        :raises requests.HTTPError: Grouper returned an HTTP error status
+        :raises ValueError: Grouper did not return a successful result code
 
         :return: Grouper metadata
         """
 
-        endpoint = self.url(f"groups/{group}/members")
+        if page_size is None:
+            page_size = self.grouper_page_size
 
-        rsp = requests.get(endpoint, auth=self.grouper_auth)
+        endpoint = self.url(f"groups/{group}/members")
 
-        grouper_query_dict = vars(self)
+        grouper_query_dict = dict(vars(self))
 
         # Append query specifics
         grouper_query_dict['grouper_members_url'] = endpoint
         grouper_query_dict['grouper_group'] = group
 
-        if 'wsSubjects' in rsp.json()['WsGetMembersLiteResult']:
-            grouper_query_dict['members'] = \
-                {s['id'] for s in rsp.json()['WsGetMembersLiteResult']['wsSubjects']}
+        members = set()
+        if page_size:
+            page_number = 0
+            while True:
+                page_number += 1
+                params = {'pageSize': page_size, 'pageNumber': page_number,
+                          'sortString': 'subjectId', 'ascending': 'T'}
+                n_members = len(members)
+                n_page = self._stream_members(endpoint, members, params=params)
+                if n_page < page_size:
+                    break
+                # Guard against a server that ignores paging
+                if len(members) == n_members:
+                    self.log.warning(f"{group}: page {page_number} has no new " +
+                                     "members, stopping")
+                    break
+            self.log.debug(f"{group}: {len(members)} members in " +
+                           f"{page_number} pages")
         else:
-            grouper_query_dict['members'] = set([])
+            self._stream_members(endpoint, members)
+
+        if as_array:
+            members = to_member_array(members)
+        grouper_query_dict['members'] = members
 
         return grouper_query_dict
 
+    def _stream_members(self, endpoint: str, members: set,
+                        params: Optional[dict] = None) -> int:
+        """
+        Stream one Grouper "Get Members" response into ``members``
+
+        :raises requests.HTTPError: Grouper returned an HTTP error status
+        :raises ValueError: Grouper did not return a successful result code
+
+        :return: Number of subjects in the response
+        """
+
+        rsp = self.transport.get(endpoint, params=params, stream=True)
+        metadata = dict()
+        try:
+            rsp.raise_for_status()
+            n_subjects = 0
+            for subject_id in iter_subject_ids(
+                    rsp.iter_content(chunk_size=stream_chunk_size),
+                    metadata=metadata):
+                members.add(subject_id)
+                n_subjects += 1
+        finally:
+            rsp.close()
+
+        # An error body would otherwise look like an empty group
+        result_code = metadata.get('resultCode')
+        if result_code != 'SUCCESS':
+            raise ValueError(f"{endpoint}: unable to retrieve members, " +
+                             f"result code = {result_code}")
+
+        return n_subjects
+
+    def query_many(self, groups: List[str], as_array: bool = False,
+                   chunk_size: Optional[int] = None) \
+            -> Dict[str, Dict[str, Any]]:
+        """
+        Query Grouper for the members of several groups with
+        ``WsRestGetMembersRequest``, using one request per ``chunk_size``
+        groups. With ``grouper_page_size``, only the first page of each group
+        is requested, and groups with a full page are retrieved with the
+        streamed and paged :meth:`query`
+
+        See `Grouper API "Get Members"
+        <https://spaces.at.internet2.edu/display/Grouper/Get+Members>`_
+
+        :param groups: List of Grouper full group paths from
+               :func:`requiam.commons.figshare_group`
+        :param as_array: Return members as a compact array from
+               :func:`requiam.membership.to_member_array`.
+               Default: ``False`` (set)
+        :param chunk_size: Number of groups per request.
+               Default: ``self.grouper_query_chunk``
+
+        :raises requests.HTTPError: Grouper returned an HTTP error status
+        :raises ValueError: The response is missing a requested group
+
+        :return: Grouper metadata for each group, in the same form as
+                 :meth:`query`. Groups that could not be retrieved
+                 (e.g., do not exist) are not included
+        """
+
+        if chunk_size is None:
+            chunk_size = self.grouper_query_chunk
+        chunk_size = max(chunk_size, 1)
+
+        endpoint = self.url('groups')
+
+        results = dict()
+        full_groups = []
+        for i in range(0, len(groups), chunk_size):
+            chunk = list(groups[i:i + chunk_size])
+
+            params = dict()
+            params['WsRestGetMembersRequest'] = {
+                'wsGroupLookups': [{'groupName': group} for group in chunk],
+                'includeSubjectDetail': 'F'
+            }
+            if self.grouper_page_size:
+                params['WsRestGetMembersRequest'].update({
+                    'pageSize': str(self.grouper_page_size), 'pageNumber': '1',
+                    'sortString': 'subjectId', 'ascending': 'T'})
+
+            rsp = self.transport.post(endpoint, json=params,
+                                      headers=self.headers, idempotent=True)
+            rsp.raise_for_status()
+            rsp_j = rsp.json()  # Decoded once per request
+
+            # Results are matched on the group name, not on their position
+            group_results = rsp_j['WsGetMembersResults'].get('results', [])
+            failed = []
+            n_unnamed = 0
+            for group_result in group_results:
+                group = group_result.get('wsGroup', {}).get('name')
+                result_code = group_result['resultMetadata']['resultCode']
+                if result_code != 'SUCCESS':
+                    self.log.warning(f"{group}: unable to retrieve members, " +
+                                     f"result code = {result_code}")
+                    if group:
+                        failed.append(group)
+                    else:
+                        n_unnamed += 1
+                    continue
+
+                if group not in chunk:
+                    raise ValueError(f"Unexpected Grouper result for {group}")
+
+                members = {s['id'] for s in group_result.get('wsSubjects', [])}
+
+                # Groups with a full page are retrieved with query()
+                if self.grouper_page_size and \
+                        len(members) >= self.grouper_page_size:
+                    full_groups.append(group)
+                    continue
+
+                if as_array:
+                    members = to_member_array(members)
+
+                grouper_query_dict = dict(vars(self))
+                grouper_query_dict['grouper_members_url'] = \
+                    self.url(f"groups/{group}/members")
+                grouper_query_dict['grouper_group'] = group
+                grouper_query_dict['members'] = members
+
+                results[group] = grouper_query_dict
+
+            missing = [group for group in chunk if group not in results and
+                       group not in full_groups and group not in failed]
+            if len(missing) > n_unnamed:
+                raise ValueError(f"Missing Grouper results for {', '.join(missing)}")
+
+        for group in full_groups:
+            results[group] = self.query(group, as_array=as_array)
+
+        return results
+
     def get_group_list(self, group_type: str) -> Any:
         """
         Retrieve list of groups in a Grouper stem
@@ -135,8 +481,8 @@ class Grouper:
                  'stemName': grouper_stem}
         }
 
-        rsp = requests.post(endpoint, json=params, headers=self.headers,
-                            auth=self.grouper_auth)
+        rsp = self.transport.post(endpoint, json=params, headers=self.headers,
+                                  idempotent=True)
 
         return rsp.json()
 
@@ -162,14 +508,61 @@ class Grouper:
                  'groupName': group}
         }
 
-        rsp = requests.post(endpoint, json=params, headers=self.headers,
-                            auth=self.grouper_auth)
+        rsp = self.transport.post(endpoint, json=params, headers=self.headers,
+                                  idempotent=True)
 
         return rsp.json()['WsFindGroupsResults']['groupResults']
 
+    def get_group_index(self, group_type: str, refresh: bool = False) \
+            -> Optional[Dict[str, Dict[str, dict]]]:
+        """
+        Retrieve a cached index of the groups in a Grouper stem.
+
+        The stem listing from :meth:`get_group_list` is downloaded once and
+        indexed by 'displayExtension', 'name' and 'uuid'. Use
+        :meth:`invalidate_group_index` after the stem is modified
+
+        :param group_type: Grouper stem.
+               Options are: 'portal', 'quota', 'test', 'group_active', ''
+        :param refresh: Bool to download the stem listing again.
+               Default: ``False``
+
+        :raises ValueError: If incorrect ``group_type``
+
+        :return: Index of group results for each key.
+                 ``None`` if the stem is empty
+        """
+
+        if refresh or group_type not in self.group_index:
+            result = self.get_group_list(group_type)
+
+            group_results = result['WsFindGroupsResults'].get('groupResults')
+            if group_results is None:
+                self.group_index[group_type] = None
+            else:
+                self.group_index[group_type] = {
+                    key: {str(g[key]): g for g in group_results if key in g}
+                    for key in ['displayExtension', 'name', 'uuid']
+                }
+
+        return self.group_index[group_type]
+
+    def invalidate_group_index(self, group_type: Optional[str] = None) -> None:
+        """
+        Remove cached stem listing(s) from :meth:`get_group_index`
+
+        :param group_type: Grouper stem. Default: all stems
+        """
+
+        if group_type is None:
+            self.group_index.clear()
+        else:
+            self.group_index.pop(group_type, None)
+
     def check_group_exists(self, group: str, group_type: str) -> bool:
         """
-        Check whether a Grouper group exists within a Grouper stem
+        Check whether a Grouper group exists within a Grouper stem.
+        The stem listing is cached with :meth:`get_group_index`
 
         See `Grouper API "Find Groups"
         <https://spaces.at.internet2.edu/display/Grouper/Find+Groups>`_
@@ -186,18 +579,13 @@ class Grouper:
         if group_type not in ['portal', 'quota', 'test', 'group_active', '']:
             raise ValueError("Incorrect [group_type] input")
 
-        result = self.get_group_list(group_type)
-
-        try:
-            group_df = pd.DataFrame(result['WsFindGroupsResults']['groupResults'])
+        group_index = self.get_group_index(group_type)
 
-            df_query = group_df.loc[group_df['displayExtension'] == str(group)]
-
-            status = True if not df_query.empty else False
-            return status
-        except KeyError:
+        if group_index is None:
             raise KeyError("Stem is empty")
 
+        return str(group) in group_index['displayExtension']
+
     def add_group(self, group: str, group_type: str, description: str) \
             -> bool:
         """
@@ -237,12 +625,14 @@ class Grouper:
         }
 
         try:
-            result = requests.post(endpoint, json=params, headers=self.headers,
-                                   auth=self.grouper_auth)
+            result = self.transport.post(endpoint, json=params,
+                                         headers=self.headers, write=True,
+                                         idempotent=True)
 
             metadata = result.json()['WsGroupSaveResults']['resultMetadata']
 
             if metadata['resultCode'] == 'SUCCESS':
+                self.invalidate_group_index(group_type)
                 return True
             else:
                 errmsg = f"add_group - Error: {metadata['resultCode']}"
@@ -250,6 +640,73 @@ class Grouper:
         except requests.exceptions.HTTPError:
             raise requests.exceptions.HTTPError
 
+    def add_groups(self, groups: List[str], group_type: str,
+                   descriptions: List[str], chunk_size: int = 100) \
+            -> Dict[str, str]:
+        """
+        Create several Grouper groups within a Grouper stem using batched
+        ``wsGroupToSaves`` in ``WsRestGroupSaveRequest``
+
+        See `Grouper API "Group Save"
+        <https://spaces.at.internet2.edu/display/Grouper/Group+Save>`_
+
+        :param groups: List of group names
+        :param group_type: Grouper stem from
+               :func:`requiam.commons.figshare_stem`.
+               Options are: 'portal', 'quota', 'test', 'group_active'
+        :param descriptions: Description of each group to include as metadata
+        :param chunk_size: Number of groups per request. Default: 100
+
+        :raises ValueError: If incorrect ``group_type``
+
+        :return: Grouper result code for each group
+                 (e.g., 'SUCCESS_INSERTED'). 'NO_RESULT' for groups that are
+                 missing from the Grouper results
+        """
+
+        if group_type not in ['portal', 'quota', 'test', 'group_active']:
+            raise ValueError("Incorrect [group_type] input")
+
+        endpoint = self.url("groups")
+
+        group_pairs = list(zip(groups, descriptions))
+
+        result_codes = dict()
+        for i in range(0, len(group_pairs), chunk_size):
+            chunk = group_pairs[i:i + chunk_size]
+
+            group_to_saves = []
+            grouper_names = dict()
+            for group, description in chunk:
+                grouper_name = figshare_group(group, group_type,
+                                              production=self.grouper_production)
+                grouper_names[grouper_name] = group
+                group_to_saves.append(
+                    {'wsGroup': {'description': description,
+                                 'displayExtension': group,
+                                 'name': grouper_name},
+                     'wsGroupLookup': {'groupName': grouper_name}}
+                )
+
+            params = dict()
+            params['WsRestGroupSaveRequest'] = {'wsGroupToSaves': group_to_saves}
+
+            result = self.transport.post(endpoint, json=params,
+                                         headers=self.headers, write=True,
+                                         idempotent=True)
+            save_results = result.json()['WsGroupSaveResults']
+
+            # Match results by group name, groups without one have failed
+            group_codes = {group_result.get('wsGroup', {}).get('name'):
+                           group_result['resultMetadata']['resultCode']
+                           for group_result in save_results.get('results', [])}
+            for grouper_name, group in grouper_names.items():
+                result_codes[group] = group_codes.get(grouper_name, 'NO_RESULT')
+
+        self.invalidate_group_index(group_type)
+
+        return result_codes
+
     def add_privilege(self,
                       access_group: str,
                       target_group: str, 
@@ -283,7 +740,7 @@ class Grouper:
         if isinstance(privileges, str):
             privileges = [privileges]
         for privilege in privileges:
-            if privilege not in ['read', 'view', 'update', 'admin', 'optin', 'optout']:
+            if privilege not in allowed_privileges:
                 raise ValueError(f"Invalid privilege name: {privilege}")
 
         target_groupname = figshare_group(target_group, target_group_type,
@@ -295,17 +752,13 @@ class Grouper:
             raise KeyError("ERROR: Stem is empty")
 
         if group_exists:
-            args = self.get_group_details(access_group)
-            if len(args):
-                access_group_detail = args.pop()
-            else:
-                raise Exception(f"Could NOT find access_group: {access_group}")
+            access_group_uuid = self.get_group_uuid(access_group)
 
             # initialize
             params = dict()
             params['WsRestAssignGrouperPrivilegesLiteRequest'] = {
                 'allowed': 'T',
-                'subjectId': access_group_detail['uuid'],
+                'subjectId': access_group_uuid,
                 'privilegeName': '',
                 'groupName': target_groupname,
                 'privilegeType': 'access'
@@ -313,15 +766,130 @@ class Grouper:
 
             for privilege in privileges:
                 params['WsRestAssignGrouperPrivilegesLiteRequest']['privilegeName'] = privilege
-                result = requests.post(endpoint, json=params, headers=self.headers,
-                                       auth=self.grouper_auth)
+                result = self.transport.post(endpoint, json=params,
+                                             headers=self.headers, write=True,
+                                             idempotent=True)
                 metadata = result.json()['WsAssignGrouperPrivilegesLiteResult']['resultMetadata']
 
-                if metadata['resultCode'] not in ['SUCCESS_ALLOWED', 'SUCCESS_ALLOWED_ALREADY_EXISTED']:
+                if metadata['resultCode'] not in privilege_success:
                     raise ValueError(f"Unexpected result received: {metadata['resultCode']}")
 
         return True
 
+    def get_group_uuid(self, access_group: str) -> str:
+        """
+        Retrieve the UUID of a Grouper group used as a privilege subject.
+        UUIDs are cached in ``self.subject_uuids``
+
+        :param access_group: Grouper group,
+               ex: arizona.edu:Dept:LBRY:figshare:GrouperSuperAdmins
+
+        :raises Exception: Incorrect ``access_group`` (check for existence)
+
+        :return: Group UUID
+        """
+
+        if access_group not in self.subject_uuids:
+            args = self.get_group_details(access_group)
+            if len(args):
+                access_group_detail = args.pop()
+            else:
+                raise Exception(f"Could NOT find access_group: {access_group}")
+
+            self.subject_uuids[access_group] = access_group_detail['uuid']
+
+        return self.subject_uuids[access_group]
+
+    def add_privileges(self,
+                       access_privileges: Dict[str, Union[str, List[str]]],
+                       target_groups: List[str],
+                       target_group_type: str) -> Dict[str, Dict[str, str]]:
+        """
+        Add privileges for several Grouper groups to access several targets
+        with the non-lite ``WsRestAssignGrouperPrivilegesRequest``.
+
+        Access groups that share the same privileges are assigned together,
+        so each target group needs one request per distinct set of privileges
+
+        See `Grouper API "Add or remove Grouper privileges"
+        <https://spaces.at.internet2.edu/display/Grouper/Add+or+remove+grouper+privileges>`_
+
+        :param access_privileges: Grouper privileges for each Grouper group
+               to give access to, ex: ``{superadmins: 'admin',
+               admins: ['read', 'view', 'optout']}``
+        :param target_groups: Grouper groups to add privileges on,
+               ex: ["apitest"]
+        :param target_group_type: Grouper stem associated with the groups to
+               add privileges on
+
+        :raises ValueError: Incorrect privileges
+        :raises KeyError: Stem is empty
+        :raises Exception: Incorrect access group (check for existence)
+
+        :return: Result code for each target group and access group.
+                 Target groups that do not exist are given 'GROUP_NOT_FOUND'
+        """
+
+        endpoint = self.url('grouperPrivileges')
+
+        # Check privileges and group access groups by privileges
+        privilege_subjects = dict()
+        for access_group, privileges in access_privileges.items():
+            if isinstance(privileges, str):
+                privileges = [privileges]
+            for privilege in privileges:
+                if privilege not in allowed_privileges:
+                    raise ValueError(f"Invalid privilege name: {privilege}")
+            privilege_subjects.setdefault(tuple(privileges), []).append(access_group)
+
+        group_index = self.get_group_index(target_group_type)
+        if group_index is None:
+            raise KeyError("ERROR: Stem is empty")
+
+        uuids = {access_group: self.get_group_uuid(access_group)
+                 for access_group in access_privileges}
+
+        result_codes = dict()
+        for target_group in target_groups:
+            if str(target_group) not in group_index['displayExtension']:
+                result_codes[target_group] = \
+                    {access_group: 'GROUP_NOT_FOUND' for access_group in access_privileges}
+                continue
+
+            target_groupname = figshare_group(target_group, target_group_type,
+                                              production=self.grouper_production)
+
+            result_codes[target_group] = dict()
+            for privileges, access_groups in privilege_subjects.items():
+                params = dict()
+                params['WsRestAssignGrouperPrivilegesRequest'] = {
+                    'allowed': 'T',
+                    'privilegeType': 'access',
+                    'privilegeNames': list(privileges),
+                    'wsGroupLookup': {'groupName': target_groupname},
+                    'wsSubjectLookups': [{'subjectId': uuids[access_group]}
+                                         for access_group in access_groups]
+                }
+
+                result = self.transport.post(endpoint, json=params,
+                                             headers=self.headers, write=True,
+                                             idempotent=True)
+                assign_results = result.json()['WsAssignGrouperPrivilegesResults']
+
+                # Report the first unsuccessful result for each access group
+                for access_group in access_groups:
+                    result_codes[target_group][access_group] = \
+                        assign_results['resultMetadata']['resultCode']
+                    subject_codes = [r['resultMetadata']['resultCode'] for r in
+                                     assign_results.get('results', [])
+                                     if r.get('wsSubject', {}).get('id') == uuids[access_group]]
+                    if subject_codes:
+                        failed = [c for c in subject_codes if c not in privilege_success]
+                        result_codes[target_group][access_group] = \
+                            failed[0] if failed else subject_codes[0]
+
+        return result_codes
+
 
 def create_groups(groups: Union[str, List[str]],
                   group_type: str,
@@ -353,54 +921,52 @@ def create_groups(groups: Union[str, List[str]],
     if isinstance(group_descriptions, str):
         group_descriptions = [group_descriptions]
 
+    # Compare against the stem listing once
+    try:
+        group_index = grouper_api.get_group_index(group_type)
+    except KeyError:
+        group_index = None
+    if group_index is None:
+        log0.info("Stem is empty")
+        group_index = {'displayExtension': dict()}
+
+    missing_groups = []
+    missing_descriptions = []
     for group, description in zip(groups, group_descriptions):
-        add_dict = {'group': group,
-                    'group_type': group_type,
-                    'description': description}
-
-        # Check if group exists
-        try:
-            group_exists = grouper_api.check_group_exists(group, group_type)
-        except KeyError:
-            log0.info("Stem is empty")
-            group_exists = False
-
-        if not group_exists:
-            log0.info(f"Group does not exist : {group}")
-
-            if add:
-                log0.info(f'Adding {group} ...')
-                try:
-                    add_result = grouper_api.add_group(**add_dict)
-                    if add_result:
-                        log0.info("SUCCESS")
-                except HTTPError:
-                    raise HTTPError
-            else:
-                log0.info('dry run, not performing group add')
-        else:
+        if str(group) in group_index['displayExtension']:
             log0.info(f"Group exists : {group}")
+        else:
+            log0.info(f"Group does not exist : {group}")
+            missing_groups.append(group)
+            missing_descriptions.append(description)
 
+    if missing_groups:
         if add:
-            log0.info(f'Adding admin privileges for groupersuperadmins ...')
-            try:
-                add_privilege = grouper_api.add_privilege(superadmins, group, group_type, 'admin')
-                if add_privilege:
-                    log0.info("SUCCESS")
-            except HTTPError:
-                raise HTTPError
-
-            log0.info(f'Adding privileges for grouperadmins ...')
-            try:
-                add_privilege = grouper_api.add_privilege(admins, group, group_type,
-                                                          ['read', 'view', 'optout'])
-                if add_privilege:
-                    log0.info("SUCCESS")
-            except HTTPError:
-                raise HTTPError
-
+            log0.info(f'Adding {len(missing_groups)} groups ...')
+            result_codes = grouper_api.add_groups(missing_groups, group_type,
+                                                  missing_descriptions)
+            for group, result_code in result_codes.items():
+                if result_code.startswith('SUCCESS'):
+                    log0.info(f"{group} : {result_code}")
+                else:
+                    log0.warning(f"{group} : {result_code}")
         else:
-            log0.info('dry run, not performing privilege add')
+            log0.info('dry run, not performing group add')
+
+    if add:
+        log0.info('Adding privileges for groupersuperadmins and grouperadmins ...')
+        access_privileges = {superadmins: 'admin',
+                             admins: ['read', 'view', 'optout']}
+        result_codes = grouper_api.add_privileges(access_privileges, groups,
+                                                  group_type)
+        for group, group_codes in result_codes.items():
+            for access_group, result_code in group_codes.items():
+                if result_code in privilege_success:
+                    log0.info(f"{group} : {access_group} : {result_code}")
+                else:
+                    log0.warning(f"{group} : {access_group} : {result_code}")
+    else:
+        log0.info('dry run, not performing privilege add')
 
 
 def create_active_group(group: str,
@@ -443,7 +1009,8 @@ def grouper_delta_user(group: str,
                        mo: Optional[ManualOverride] = None,
                        sync: bool = False,
                        log: Optional[Logger] = None,
-                       production: bool = True) -> Delta:
+                       production: bool = True,
+                       grouper: Optional[Grouper] = None) -> Delta:
     """
     Construct a Delta object for addition/deletion based for a specified
     user. This is designed primarily for the user_update script
@@ -461,6 +1028,9 @@ def grouper_delta_user(group: str,
     :param log: LogClass object. Default: ``None``
     :param production: Use production stem. Otherwise a stage/test is used.
            Default: ``True``
+    :param grouper: :class:`requiam.grouper.Grouper` object, so that calls
+           share its transport and rate limit. Default: a new one from
+           ``grouper_dict``
 
     :return: ``Delta`` object
     """
@@ -469,7 +1039,8 @@ def grouper_delta_user(group: str,
         log = log_stdout()
 
     grouper_query = figshare_group(group, stem, production=production)
-    grouper = Grouper(**grouper_dict)
+    if isinstance(grouper, type(None)):
+        grouper = Grouper(**grouper_dict)
     grouper_query_dict = grouper.query(grouper_query)
 
     if not isinstance(netid, list):
@@ -0,0 +1,265 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from logging import Logger
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from .delta import Delta
+from .grouper import Grouper
+from .membership import Members, member_list
+
+
+class AsyncGrouper:
+    """
+    This class provides an asyncio client for Grouper Web Services that
+    mirrors :class:`requiam.grouper.Grouper` and the member batches of
+    :meth:`requiam.delta.Delta.synchronize`.
+
+    Calls are scheduled on a bounded thread pool that shares the pooled
+    :class:`requiam.transport.GrouperTransport` of ``grouper``. At most
+    ``max_concurrent`` calls are in flight overall and at most
+    ``max_per_endpoint`` for each Grouper endpoint ('members', 'groups',
+    'grouperPrivileges'). The synchronous ``Grouper`` API is unchanged
+
+    This is not a native async HTTP client, and ``Grouper`` is not a wrapper
+    around it. The blocking ``requests`` calls of ``Grouper`` and ``Delta``
+    are awaited through the thread pool instead, so that both APIs share
+    one transport with its rate limit, retries and circuit breaker, and
+    streamed member parsing, without a new HTTP dependency
+
+    Usage:
+
+    .. highlight:: python
+    .. code-block:: python
+
+        import asyncio
+
+        ga = Grouper(grouper_host, grouper_base_path, USERNAME, PASSWORD)
+        agc = AsyncGrouper(ga, max_concurrent=10, max_per_endpoint=4)
+
+        query_dicts = asyncio.run(agc.query_gather(grouper_groups))
+
+    :param grouper: :class:`requiam.grouper.Grouper` object
+    :param max_concurrent: Maximum number of Grouper calls in flight.
+           Default: 10
+    :param max_per_endpoint: Maximum number of Grouper calls in flight for
+           each endpoint. Default: 4
+    :param log: File and/or stdout logging. Default: ``grouper.log``
+
+    :ivar grouper: :class:`requiam.grouper.Grouper` object
+    :ivar max_concurrent: Maximum number of Grouper calls in flight
+    :ivar max_per_endpoint: Maximum number of Grouper calls in flight for
+          each endpoint
+    :ivar executor: Thread pool for Grouper calls
+    """
+
+    def __init__(self, grouper: Grouper, max_concurrent: int = 10,
+                 max_per_endpoint: int = 4,
+                 log: Optional[Logger] = None) -> None:
+
+        if isinstance(log, type(None)):
+            self.log = grouper.log
+        else:
+            self.log = log
+
+        self.grouper = grouper
+        self.max_concurrent = max_concurrent
+        self.max_per_endpoint = max_per_endpoint
+
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent)
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._endpoint_semaphores: Dict[str, asyncio.Semaphore] = dict()
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def run(self, endpoint: str, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run a blocking Grouper call within the concurrency limits
+
+        :param endpoint: Grouper endpoint name for the per-endpoint limit
+        :param func: Callable that issues the Grouper call
+        :param args: Positional arguments for ``func``
+        :param kwargs: Keyword arguments for ``func``
+
+        :return: Result of ``func``
+        """
+
+        # Semaphores are bound to the running event loop
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._endpoint_semaphores = dict()
+            self._semaphore_loop = loop
+
+        if endpoint not in self._endpoint_semaphores:
+            self._endpoint_semaphores[endpoint] = \
+                asyncio.Semaphore(self.max_per_endpoint)
+
+        async with self._endpoint_semaphores[endpoint]:
+            async with self._semaphore:
+                return await loop.run_in_executor(self.executor,
+                                                  partial(func, *args, **kwargs))
+
+    async def query(self, group: str, as_array: bool = False,
+                    page_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        See :meth:`requiam.grouper.Grouper.query`
+        """
+
+        return await self.run('members', self.grouper.query, group,
+                              as_array=as_array, page_size=page_size)
+
+    async def query_gather(self, groups: List[str],
+                           as_array: bool = False) -> List[Dict[str, Any]]:
+        """
+        Run :meth:`query` for several groups at once
+
+        :param groups: List of Grouper full group paths
+        :param as_array: Return members as compact arrays. Default: ``False``
+
+        :return: List of Grouper metadata, in the order of ``groups``
+        """
+
+        return list(await asyncio.gather(*[self.query(group, as_array=as_array)
+                                           for group in groups]))
+
+    async def get_group_list(self, group_type: str) -> Any:
+        """
+        See :meth:`requiam.grouper.Grouper.get_group_list`
+        """
+
+        return await self.run('groups', self.grouper.get_group_list, group_type)
+
+    async def add_group(self, group: str, group_type: str,
+                        description: str) -> bool:
+        """
+        See :meth:`requiam.grouper.Grouper.add_group`
+        """
+
+        return await self.run('groups', self.grouper.add_group, group,
+                              group_type, description)
+
+    async def add_privilege(self, access_group: str, target_group: str,
+                            target_group_type: str,
+                            privileges: Union[str, List[str]]) -> bool:
+        """
+        See :meth:`requiam.grouper.Grouper.add_privilege`
+        """
+
+        return await self.run('grouperPrivileges', self.grouper.add_privilege,
+                              access_group, target_group, target_group_type,
+                              privileges)
+
+    async def drop_batch(self, d: Delta, batch: List[str],
+                         n_batch: int) -> Dict[str, Any]:
+        """
+        See :meth:`requiam.delta.Delta.drop_batch`
+        """
+
+        return await self.run('members', d.drop_batch, batch, n_batch)
+
+    async def add_batch(self, d: Delta, batch: List[str],
+                        n_batch: int) -> Dict[str, Any]:
+        """
+        See :meth:`requiam.delta.Delta.add_batch`
+        """
+
+        return await self.run('members', d.add_batch, batch, n_batch)
+
+    async def submit_batches(self, d: Delta, send: Callable, members: Members,
+                             batch_size: Optional[int] = None) -> None:
+        """
+        Asynchronous equivalent of the batch submission in
+        :meth:`requiam.delta.Delta.synchronize`. Batches are sliced as they
+        are submitted, so adaptive batch sizes apply, with at most
+        ``max_per_endpoint`` batches of the group in flight
+
+        :param d: :class:`requiam.delta.Delta` object
+        :param send: :meth:`drop_batch` or :meth:`add_batch`
+        :param members: Member IDs to drop or add
+        :param batch_size: Fixed batch size. Default:
+               :meth:`requiam.delta.Delta.next_batch_size`
+        """
+
+        list_of_members = member_list(members)
+        start = 0
+        n_batch = 0
+
+        in_flight = set()
+        while start < len(list_of_members) or in_flight:
+            while start < len(list_of_members) and \
+                    len(in_flight) < self.max_per_endpoint:
+                size = batch_size if batch_size else d.next_batch_size()
+                n_batch += 1
+                in_flight.add(asyncio.ensure_future(
+                    send(d, list_of_members[start:start + size], n_batch)))
+                start += size
+
+            done, in_flight = await asyncio.wait(in_flight,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+
+    async def retry_failed(self, d: Delta, action: str, send: Callable) -> None:
+        """
+        Re-send only the failed members of a group, in batches of
+        ``batch_retry_size``, up to ``batch_retries`` times
+
+        :param d: :class:`requiam.delta.Delta` object
+        :param action: 'drop' or 'add'
+        :param send: :meth:`drop_batch` or :meth:`add_batch`
+        """
+
+        for n_retry in range(1, d.batch_retries + 1):
+            retry_members = d.take_retry_members(action, n_retry)
+            if not retry_members:
+                return
+
+            await self.submit_batches(d, send, retry_members,
+                                      batch_size=d.batch_retry_size)
+
+    async def synchronize(self, d: Delta) -> None:
+        """
+        Asynchronous :meth:`requiam.delta.Delta.synchronize`. Drop batches
+        are sent concurrently and completed, with retries of failed members,
+        before the add batches. Groups that are replaced are synchronized in
+        one call
+
+        :param d: :class:`requiam.delta.Delta` object
+        """
+
+        # Membership replacement only needs a few sequential requests
+        if d.replace_ready():
+            await self.run('members', d.synchronize)
+            return
+
+        if not d.sync_ready():
+            return
+
+        d.journal_plan()
+
+        d.log.info('processing drops:')
+        await self.submit_batches(d, self.drop_batch, d.drops)
+        await self.retry_failed(d, 'drop', self.drop_batch)
+
+        d.log.info('processing adds:')
+        await self.submit_batches(d, self.add_batch, d.adds)
+        await self.retry_failed(d, 'add', self.add_batch)
+
+        d.sync_done()
+
+    async def synchronize_gather(self, deltas: List[Delta]) -> None:
+        """
+        Run :meth:`synchronize` for several groups at once
+
+        :param deltas: List of :class:`requiam.delta.Delta` objects
+        """
+
+        await asyncio.gather(*[self.synchronize(d) for d in deltas])
+
+    def close(self) -> None:
+        """
+        Shut down the thread pool
+        """
+
+        self.executor.shutdown(wait=True)
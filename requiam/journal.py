@@ -0,0 +1,175 @@
+from datetime import datetime, timezone
+from logging import Logger
+from os import fsync
+from os.path import exists
+from typing import Any, Dict, List, Optional
+import json
+import threading
+
+from redata.commons.logger import log_stdout
+
+
+class SyncJournal:
+    """
+    This class provides a crash-safe, append-only JSONL journal of Grouper
+    synchronization. It records the planned adds and drops of each group,
+    each batch of members as it is acknowledged by Grouper, and the
+    completion of each group. Every record is flushed to disk before the
+    next batch, so a run that dies halfway can be resumed with
+    :meth:`pending` without repeating finished batches or any EDS and
+    Grouper reads
+
+    Usage:
+
+    .. highlight:: python
+    .. code-block:: python
+
+        from requiam.journal import SyncJournal
+
+        journal = SyncJournal('sync_journal.jsonl')
+        journal.start()  # New run
+        d = Delta(..., journal=journal)
+        d.synchronize()
+
+        # After a crash
+        for plan in SyncJournal('sync_journal.jsonl').pending():
+            d = Delta.from_plan(plan, grouper_query_dict, **delta_dict)
+            d.synchronize()
+
+    :param journal_file: Full path to JSONL journal file
+    :param log: File and/or stdout logging
+
+    :ivar journal_file: Full path to JSONL journal file
+    :ivar log: File and/or stdout logging
+    """
+
+    def __init__(self, journal_file: str, log: Optional[Logger] = None) -> None:
+
+        if isinstance(log, type(None)):
+            self.log = log_stdout()
+        else:
+            self.log = log
+
+        self.journal_file = journal_file
+
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """
+        Start a new journal, discarding records of earlier runs
+        """
+
+        with self._lock:
+            with open(self.journal_file, 'w') as f:
+                self._write(f, {'type': 'start'})
+
+    def append(self, record: Dict[str, Any]) -> None:
+        """
+        Append a record and flush it to disk
+
+        :param record: JSON-serializable record with a 'type'
+        """
+
+        with self._lock:
+            with open(self.journal_file, 'a') as f:
+                self._write(f, record)
+
+    @staticmethod
+    def _write(f, record: Dict[str, Any]) -> None:
+        record['time'] = datetime.now(timezone.utc).isoformat()
+        f.write(json.dumps(record) + '\n')
+        f.flush()
+        fsync(f.fileno())
+
+    def plan(self, group: str, members_url: str,
+             drops: List[str], adds: List[str]) -> None:
+        """
+        Record the planned drops and adds of a group
+
+        :param group: Grouper group
+        :param members_url: Grouper members URL of the group
+        :param drops: Member IDs to drop
+        :param adds: Member IDs to add
+        """
+
+        self.append({'type': 'plan', 'group': group,
+                     'members_url': members_url,
+                     'drops': drops, 'adds': adds})
+
+    def ack(self, group: str, action: str, members: List[str]) -> None:
+        """
+        Record members acknowledged by Grouper
+
+        :param group: Grouper group
+        :param action: 'drop' or 'add'
+        :param members: Member IDs that were dropped or added
+        """
+
+        if members:
+            self.append({'type': 'ack', 'group': group, 'action': action,
+                         'members': members})
+
+    def done(self, group: str) -> None:
+        """
+        Record the completion of a group
+
+        :param group: Grouper group
+        """
+
+        self.append({'type': 'done', 'group': group})
+
+    def read(self) -> List[Dict[str, Any]]:
+        """
+        Read all records. A partially written last record is ignored
+
+        :return: List of records
+        """
+
+        records = []
+        if not exists(self.journal_file):
+            return records
+
+        with open(self.journal_file) as f:
+            lines = f.readlines()
+
+        for n, line in enumerate(lines):
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                if n == len(lines) - 1:
+                    self.log.warning("Journal: ignoring incomplete last record")
+                else:
+                    raise
+
+        return records
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """
+        Return the remaining drops and adds of groups that were planned but
+        not completed
+
+        :return: List of plans with 'group', 'members_url', 'drops' and 'adds'
+        """
+
+        plans = dict()
+        acked = dict()
+        for record in self.read():
+            group = record.get('group')
+            if record['type'] == 'plan':
+                plans[group] = record
+                acked[group] = {'drop': set(), 'add': set()}
+            elif record['type'] == 'ack' and group in acked:
+                acked[group][record['action']].update(record['members'])
+            elif record['type'] == 'done':
+                plans.pop(group, None)
+
+        pending = []
+        for group, plan in plans.items():
+            pending.append({
+                'group': group,
+                'members_url': plan['members_url'],
+                'drops': [m for m in plan['drops'] if m not in acked[group]['drop']],
+                'adds': [m for m in plan['adds'] if m not in acked[group]['add']]
+            })
+
+        return pending
@@ -0,0 +1,137 @@
+from logging import Logger
+from typing import List, Optional
+import hashlib
+import re
+import sqlite3
+import time
+import zlib
+
+from redata.commons.logger import log_stdout
+
+
+class LDAPCache:
+    """
+    This class provides an on-disk cache of LDAP search results. Each entry
+    is keyed by the normalized LDAP query, the search DN and the attribute
+    list, and stores the ``uaid`` set as a compressed, sorted list in a
+    single sqlite file. Entries expire after ``ttl`` seconds, and the least
+    recently used entries are evicted beyond ``max_entries``
+
+    Usage:
+
+    .. highlight:: python
+    .. code-block:: python
+
+        from requiam.ldap_cache import LDAPCache
+
+        ldc = ldap_query.LDAPConnection(eds_hostname, ldap_base_dn,
+                                        USERNAME, PASSWORD,
+                                        cache=LDAPCache('ldap_cache.sqlite'))
+
+    :param cache_file: Full path to sqlite cache file
+    :param ttl: Time-to-live of cache entries in seconds. Default: 3600
+    :param max_entries: Maximum number of cache entries. Default: 5000
+    :param log: File and/or stdout logging
+
+    :ivar cache_file: Full path to sqlite cache file
+    :ivar ttl: Time-to-live of cache entries in seconds
+    :ivar max_entries: Maximum number of cache entries
+    :ivar log: File and/or stdout logging
+    :ivar int hits: Number of cache hits
+    :ivar int misses: Number of cache misses
+    """
+
+    def __init__(self, cache_file: str, ttl: int = 3600,
+                 max_entries: int = 5000,
+                 log: Optional[Logger] = None) -> None:
+
+        if isinstance(log, type(None)):
+            self.log = log_stdout()
+        else:
+            self.log = log
+
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self.hits: int = 0
+        self.misses: int = 0
+
+        self.db = sqlite3.connect(cache_file)
+        self.db.execute('CREATE TABLE IF NOT EXISTS ldap_cache '
+                        '(key TEXT PRIMARY KEY, created REAL, '
+                        'accessed REAL, members BLOB)')
+        self.db.commit()
+
+    @staticmethod
+    def key(query: str, search_dn: str, attributes: List[str]) -> str:
+        """
+        Return the cache key for an LDAP search. Whitespace around
+        parentheses in the query is ignored
+
+        :param query: RFC 4512-compatible LDAP query
+        :param search_dn: LDAP search distinguished name
+        :param attributes: LDAP attributes
+
+        :return: Cache key
+        """
+
+        norm_query = re.sub(r'\s*([()])\s*', r'\1', query.strip())
+        key_str = '|'.join([search_dn.lower(),
+                            ','.join(sorted(attributes)), norm_query])
+
+        return hashlib.sha256(key_str.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[set]:
+        """
+        Retrieve a cached set of members
+
+        :param key: Cache key from :meth:`key`
+
+        :return: Set of members or ``None`` if missing or expired
+        """
+
+        now = time.time()
+        row = self.db.execute('SELECT created, members FROM ldap_cache '
+                              'WHERE key = ?', (key,)).fetchone()
+
+        if row is None or now - row[0] > self.ttl:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.db.execute('UPDATE ldap_cache SET accessed = ? WHERE key = ?',
+                        (now, key))
+        self.db.commit()
+
+        members = zlib.decompress(row[1]).decode('utf-8')
+        return set(members.split('\n')) if members else set()
+
+    def put(self, key: str, members: set) -> None:
+        """
+        Store a set of members and evict expired and least recently used
+        entries
+
+        :param key: Cache key from :meth:`key`
+        :param members: Set of members
+        """
+
+        now = time.time()
+        blob = zlib.compress('\n'.join(sorted(members)).encode('utf-8'))
+
+        self.db.execute('INSERT OR REPLACE INTO ldap_cache '
+                        'VALUES (?, ?, ?, ?)', (key, now, now, blob))
+        self.db.execute('DELETE FROM ldap_cache WHERE created < ?',
+                        (now - self.ttl,))
+        self.db.execute('DELETE FROM ldap_cache WHERE key NOT IN '
+                        '(SELECT key FROM ldap_cache '
+                        'ORDER BY accessed DESC LIMIT ?)', (self.max_entries,))
+        self.db.commit()
+
+    def clear(self) -> None:
+        """
+        Remove all cache entries
+        """
+
+        self.db.execute('DELETE FROM ldap_cache')
+        self.db.commit()
@@ -0,0 +1,273 @@
+from datetime import datetime, timedelta, timezone
+from logging import Logger
+from os import replace
+from os.path import exists
+from typing import Dict, List, Optional
+import gzip
+import hashlib
+import json
+
+from redata.commons.logger import log_stdout
+
+from .ldap_cache import LDAPCache
+
+timestamp_format = '%Y%m%d%H%M%SZ'
+
+
+class IncrementalState:
+    """
+    This class enables incremental EDS searches based on ``modifyTimestamp``.
+    It persists the high-water mark of the last run and the membership of
+    each set of queries. On the next run, only the entries modified since
+    the high-water mark are retrieved and the stored memberships are patched:
+    members that changed are removed and re-added if they still match.
+    Groups whose membership did not change are reported as untouched.
+    A membership is only stored once it is committed with :meth:`commit`,
+    e.g. after its synchronization succeeded. Groups that are not committed
+    are searched in full on the next run. A fingerprint of the synchronized
+    membership, including manual overrides, is committed as well so that
+    override changes touch a group
+
+    Entries that are deleted from EDS do not show up in ``modifyTimestamp``
+    searches, so a full refresh is performed when the last full refresh is
+    older than ``max_age``. Searches bypass the LDAP result cache, as cached
+    memberships would predate the high-water mark
+
+    Usage:
+
+    .. highlight:: python
+    .. code-block:: python
+
+        from requiam.ldap_incremental import IncrementalState
+
+        ldc.incremental = IncrementalState('ldap_incremental.json.gz')
+        ldc.incremental.begin(ldc)
+
+        members = ldap_query.ldap_search(ldc, ldap_queries)
+        members = mo.identify_changes(members, portal, 'portal')
+        if not ldc.incremental.is_touched(ldc, ldap_queries, members=members):
+            ...
+        d.synchronize()
+        if d.synced:
+            ldc.incremental.commit(ldc, ldap_queries, members=members)
+
+        ldc.incremental.save()
+
+    :param state_file: Full path to gzipped JSON state file
+    :param max_age: Maximum time between full refreshes in seconds.
+           Default: 86400
+    :param overlap: Overlap in seconds subtracted from the high-water mark
+           to allow for clock skew and in-flight changes. Default: 600
+    :param log: File and/or stdout logging
+
+    :ivar state_file: Full path to gzipped JSON state file
+    :ivar max_age: Maximum time between full refreshes in seconds
+    :ivar overlap: Overlap in seconds subtracted from the high-water mark
+    :ivar log: File and/or stdout logging
+    :ivar high_water_mark: ``modifyTimestamp`` of the last run
+    :ivar full_refresh: Time of the last full refresh
+    :ivar groups: Stored membership for each set of queries
+    :ivar searched: Membership for each set of queries searched in this run
+    :ivar committed: Keys of the memberships committed in this run
+    :ivar fingerprints: Fingerprint of the synchronized membership for each
+          set of queries
+    :ivar changed: ``uaid`` of entries modified since ``high_water_mark``.
+          ``None`` for a full refresh
+    :ivar touched: Whether the membership for each set of queries changed
+    """
+
+    def __init__(self, state_file: str, max_age: int = 86400,
+                 overlap: int = 600, log: Optional[Logger] = None) -> None:
+
+        if isinstance(log, type(None)):
+            self.log = log_stdout()
+        else:
+            self.log = log
+
+        self.state_file = state_file
+        self.max_age = max_age
+        self.overlap = overlap
+
+        self.high_water_mark: Optional[str] = None
+        self.full_refresh: Optional[str] = None
+        self.groups: Dict[str, set] = dict()
+        self.fingerprints: Dict[str, str] = dict()
+
+        self.changed: Optional[set] = None
+        self.touched: Dict[str, bool] = dict()
+        self.searched: Dict[str, set] = dict()
+        self.committed: set = set()
+        self._run_start: Optional[datetime] = None
+
+        if exists(state_file):
+            with gzip.open(state_file, 'rt') as f:
+                state = json.load(f)
+            self.high_water_mark = state['high_water_mark']
+            self.full_refresh = state['full_refresh']
+            self.groups = {key: set(members) for
+                           key, members in state['groups'].items()}
+            self.fingerprints = state.get('fingerprints', dict())
+
+    @staticmethod
+    def key(ldapconnection, queries: List[str]) -> str:
+        """
+        Return the state key for a set of LDAP queries
+
+        :param ldapconnection: :class:`requiam.ldap_query.LDAPConnection` object
+        :param queries: List of RFC 4512-compatible LDAP queries
+
+        :return: State key
+        """
+
+        return LDAPCache.key('\n'.join(sorted(queries)),
+                             ldapconnection.ldap_search_dn,
+                             ldapconnection.ldap_attribs)
+
+    @staticmethod
+    def fingerprint(members) -> str:
+        """
+        Return a fingerprint of a membership
+
+        :param members: Member IDs
+
+        :return: SHA-256 hex digest of the sorted member IDs
+        """
+
+        return hashlib.sha256('\n'.join(sorted(str(member) for member in members))
+                              .encode()).hexdigest()
+
+    def begin(self, ldapconnection) -> None:
+        """
+        Start an incremental run. Retrieve the entries modified since the
+        high-water mark, unless a full refresh is needed
+
+        :param ldapconnection: :class:`requiam.ldap_query.LDAPConnection` object
+        """
+
+        self._run_start = datetime.now(timezone.utc)
+        self.touched = dict()
+        self.searched = dict()
+        self.committed = set()
+
+        full = self.high_water_mark is None or self.full_refresh is None
+        if not full:
+            last_full = datetime.strptime(self.full_refresh, timestamp_format)
+            last_full = last_full.replace(tzinfo=timezone.utc)
+            full = (self._run_start - last_full).total_seconds() > self.max_age
+
+        if full:
+            self.log.info("Incremental EDS: performing full refresh")
+            self.changed = None
+            self.groups = dict()
+            self.fingerprints = dict()
+            self.full_refresh = self._run_start.strftime(timestamp_format)
+            return
+
+        query = f"(modifyTimestamp>={self.high_water_mark})"
+        self.changed = ldapconnection.search_many([query], cache=False)
+        self.log.info(f"Incremental EDS: {len(self.changed)} entries " +
+                      f"modified since {self.high_water_mark}")
+
+    def search(self, ldapconnection, queries: List[str]) -> set:
+        """
+        Incremental equivalent of :func:`requiam.ldap_query.ldap_search`
+
+        :param ldapconnection: :class:`requiam.ldap_query.LDAPConnection` object
+        :param queries: List of RFC 4512-compatible LDAP queries
+
+        :return: Set of ``uaid`` members
+        """
+
+        if self._run_start is None:
+            self.begin(ldapconnection)
+
+        key = self.key(ldapconnection, queries)
+        stored = self.groups.get(key)
+
+        if self.changed is None or stored is None:
+            members = ldapconnection.search_many(queries, cache=False)
+        else:
+            changed_queries = [f"(& (modifyTimestamp>={self.high_water_mark}) {query} )"
+                               for query in queries]
+            members = (stored - self.changed) | \
+                ldapconnection.search_many(changed_queries, cache=False)
+
+        self.touched[key] = stored is None or members != stored
+        self.searched[key] = members
+
+        return members
+
+    def commit(self, ldapconnection, queries: List[str],
+               members: Optional[set] = None) -> None:
+        """
+        Store the membership for a set of queries searched in this run. This
+        should only be called after the membership has been synchronized
+        or is untouched
+
+        :param ldapconnection: :class:`requiam.ldap_query.LDAPConnection` object
+        :param queries: List of RFC 4512-compatible LDAP queries
+        :param members: Synchronized membership, e.g. after manual overrides.
+               Default: EDS membership
+        """
+
+        key = self.key(ldapconnection, queries)
+        if key in self.searched:
+            self.groups[key] = self.searched[key]
+            self.fingerprints[key] = self.fingerprint(
+                self.searched[key] if members is None else members)
+            self.committed.add(key)
+
+    def is_touched(self, ldapconnection, queries: List[str],
+                   members: Optional[set] = None) -> bool:
+        """
+        Check whether the membership for a set of queries changed since the
+        last run. Queries that were not searched in this run are touched
+
+        :param ldapconnection: :class:`requiam.ldap_query.LDAPConnection` object
+        :param queries: List of RFC 4512-compatible LDAP queries
+        :param members: Membership to synchronize, e.g. after manual
+               overrides. It is touched if it differs from the committed one
+
+        :return: ``True`` if the membership changed
+        """
+
+        key = self.key(ldapconnection, queries)
+        if self.touched.get(key, True):
+            return True
+
+        if members is not None:
+            return self.fingerprints.get(key) != self.fingerprint(members)
+        return False
+
+    def save(self) -> None:
+        """
+        Persist the high-water mark and the memberships committed in this
+        run. Memberships that were not committed would miss the changes
+        before the new high-water mark, so they are dropped
+        """
+
+        if self._run_start is None:
+            return
+
+        dropped = set(self.groups) - self.committed
+        if dropped:
+            self.log.info(f"Incremental EDS: {len(dropped)} groups not " +
+                          "committed, will search in full next run")
+        self.groups = {key: self.groups[key] for key in self.committed}
+        self.fingerprints = {key: self.fingerprints[key] for key in self.committed}
+
+        mark = self._run_start - timedelta(seconds=self.overlap)
+        self.high_water_mark = mark.strftime(timestamp_format)
+
+        state = {'high_water_mark': self.high_water_mark,
+                 'full_refresh': self.full_refresh,
+                 'groups': {key: sorted(members) for
+                            key, members in self.groups.items()},
+                 'fingerprints': self.fingerprints}
+
+        tmp_file = f"{self.state_file}.tmp"
+        with gzip.open(tmp_file, 'wt') as f:
+            json.dump(state, f)
+        replace(tmp_file, self.state_file)
+
+        self.log.info(f"Incremental EDS: saved high-water mark {self.high_water_mark}")
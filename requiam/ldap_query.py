@@ -1,9 +1,17 @@
-from typing import List
+from typing import Dict, Iterator, List, Optional, Tuple
 from logging import Logger
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+import asyncio
 import ldap3
+from ldap3.utils.conv import escape_filter_chars
 
 from redata.commons.logger import log_stdout
 
+from .ldap_cache import LDAPCache
+from .ldap_incremental import IncrementalState
+from .membership import Members, to_member_array
+
 
 class LDAPConnection:
     """
@@ -28,26 +36,50 @@ class LDAPConnection:
         portal_query = ldap_query.ual_ldap_queries(['0404', '0413', '0411'])
         members = ldap_query.ldap_search(ldc, portal_query)
 
+        # Concurrent searches over a pool of four bound connections
+        ldc = ldap_query.LDAPConnection(eds_hostname, ldap_base_dn,
+                                        USERNAME, PASSWORD, ldap_pool_size=4)
+        members = ldc.search_many(portal_query)
+        ldc.close()
+
     :param ldap_host: LDAP host URL
     :param ldap_base_dn: LDAP base distinguished name
     :param ldap_user: LDAP username
     :param ldap_password: LDAP password credentials
     :param log: File and/or stdout logging. Default: ``log_stdout``
+    :param ldap_paged_size: Page size for LDAP Simple Paged Results
+           searches (RFC 2696). Default: 0 (paging disabled)
+    :param ldap_pool_size: Number of bound connections for concurrent
+           searches with :meth:`search_many`. Default: 1 (serial searches)
+    :param cache: :class:`requiam.ldap_cache.LDAPCache` for search results.
+           Default: ``None`` (no caching)
+    :param incremental: :class:`requiam.ldap_incremental.IncrementalState`
+           for ``modifyTimestamp``-based searches with
+           :func:`requiam.ldap_query.ldap_search`. Default: ``None`` (full searches)
 
     :ivar ldap_host: LDAP host URL
     :ivar ldap_base_dn: LDAP base distinguished name
     :ivar ldap_user: LDAP username
     :ivar ldap_password: LDAP password credentials
     :ivar log: File and/or stdout logging
+    :ivar ldap_paged_size: Page size for paged searches. 0 disables paging
+    :ivar ldap_pool_size: Number of bound connections for concurrent searches
+    :ivar cache: :class:`requiam.ldap_cache.LDAPCache` for search results
+    :ivar incremental: :class:`requiam.ldap_incremental.IncrementalState`
     :ivar str ldap_bind_host: LDAP binding host URL
     :ivar str ldap_bind_dn: LDAP binding distinguished name
     :ivar str ldap_search_dn: LDAP search distinguished name
     :ivar list ldap_attribs: LDAP attributes. Set to "uaid"
+    :ivar ldc: Bound ``ldap3`` ``Connection``
     """
 
     def __init__(self, ldap_host: str, ldap_base_dn: str,
                  ldap_user: str, ldap_password: str,
-                 log: Logger = log_stdout()) -> None:
+                 log: Logger = log_stdout(),
+                 ldap_paged_size: int = 0,
+                 ldap_pool_size: int = 1,
+                 cache: Optional[LDAPCache] = None,
+                 incremental: Optional[IncrementalState] = None) -> None:
 
         log.debug('entered')
         
@@ -58,6 +90,11 @@ class LDAPConnection:
         self.ldap_base_dn = ldap_base_dn
         self.ldap_user = ldap_user
         self.ldap_password = ldap_password
+        self.log = log
+        self.ldap_paged_size = ldap_paged_size
+        self.ldap_pool_size = ldap_pool_size
+        self.cache = cache
+        self.incremental = incremental
 
         self.ldap_bind_host: str = f"ldaps://{ldap_host}"
         self.ldap_bind_dn: str = f"uid={ldap_user},ou=app users,{ldap_base_dn}"
@@ -67,11 +104,103 @@ class LDAPConnection:
         #
         # execute ldap query and populate members property
 
-        self.ldc = ldap3.Connection(self.ldap_bind_host, self.ldap_bind_dn,
-                                    self.ldap_password, auto_bind=True)
+        self.ldc = self.connect()
+
+        # Connection pool for search_many. Populated on first use
+        self._pool: Optional[Queue] = None
 
         log.debug('returning')
 
+    def connect(self) -> ldap3.Connection:
+        """
+        Open and bind a new connection to the LDAP server
+
+        :return: Bound ``ldap3`` ``Connection``
+        """
+
+        return ldap3.Connection(self.ldap_bind_host, self.ldap_bind_dn,
+                                self.ldap_password, auto_bind=True)
+
+    def close(self) -> None:
+        """
+        Unbind the connection and the pooled connections of :meth:`search_many`
+        """
+
+        connections = [self.ldc]
+        if self._pool is not None:
+            while not self._pool.empty():
+                ldc = self._pool.get()
+                if ldc is not self.ldc:
+                    connections.append(ldc)
+            self._pool = None
+
+        self.log.debug(f"closing {len(connections)} LDAP connections")
+        for ldc in connections:
+            ldc.unbind()
+
+    def search_many(self, queries: List[str], cache: bool = True) -> set:
+        """
+        Run LDAP queries concurrently over a pool of ``ldap_pool_size`` bound
+        connections and merge the ``uaid`` results. Each connection is used
+        by only one thread at a time. Cached results from ``cache`` are used
+        when available
+
+        :param queries: List of RFC 4512-compatible LDAP queries
+        :param cache: Use and populate ``cache``. Default: ``True``
+
+        :return: Set of ``uaid`` members
+        """
+
+        use_cache = cache and self.cache
+
+        all_members = set()
+
+        pending = []
+        for query in queries:
+            cached = None
+            if use_cache:
+                cached = self.cache.get(self._cache_key(query))
+
+            if cached is None:
+                pending.append(query)
+            else:
+                all_members.update(cached)
+
+        for query, members in zip(pending, self._search_queries(pending)):
+            if use_cache:
+                self.cache.put(self._cache_key(query), members)
+            all_members.update(members)
+
+        return all_members
+
+    def _cache_key(self, query: str) -> str:
+        return self.cache.key(query, self.ldap_search_dn, self.ldap_attribs)
+
+    def _search_queries(self, queries: List[str]) -> Iterator[set]:
+        """Yield the set of ``uaid`` for each query, in order"""
+
+        if self.ldap_pool_size <= 1 or len(queries) <= 1:
+            for query in queries:
+                yield _search_single(self, query, self.ldc)
+            return
+
+        if self._pool is None:
+            self.log.debug(f"opening {self.ldap_pool_size} LDAP connections")
+            self._pool = Queue()
+            self._pool.put(self.ldc)
+            for _ in range(self.ldap_pool_size - 1):
+                self._pool.put(self.connect())
+
+        def _pool_search(query: str) -> set:
+            ldc = self._pool.get()
+            try:
+                return _search_single(self, query, ldc)
+            finally:
+                self._pool.put(ldc)
+
+        with ThreadPoolExecutor(max_workers=self.ldap_pool_size) as executor:
+            yield from executor.map(_pool_search, queries)
+
 
 def uid_query(uid: str) -> list:
     """
@@ -94,6 +223,83 @@ def uid_query(uid: str) -> list:
     return [ldap_query]
 
 
+def search_uids(ldapconnection: LDAPConnection, uids: List[str],
+                attributes: List[str], chunk: int = 50) -> Dict[str, dict]:
+    """
+    Retrieve attributes for NetIDs (``uid``) with chunked
+    ``(| (uid=a) (uid=b) ...)`` queries instead of one query per NetID.
+    ``uid`` matching is case-insensitive
+
+    :param ldapconnection: :class:`requiam.ldap_query.LDAPConnection` object
+    :param uids: NetID handles/usernames
+    :param attributes: LDAP attributes to retrieve
+    :param chunk: Number of NetIDs per query. Default: 50
+
+    :return: ``dict`` of ``uid`` (as given in ``uids``) to the entry
+             attributes. NetIDs that are not found are not included
+    """
+
+    unique_uids = list(dict.fromkeys(uids))
+    lookup = {uid.lower(): uid for uid in unique_uids}
+
+    entries = dict()
+    ldc = ldapconnection.ldc
+    for i in range(0, len(unique_uids), chunk):
+        uid_chunk = unique_uids[i:i + chunk]
+        query = "(| " + \
+                " ".join(f"(uid={escape_filter_chars(uid)})" for uid in uid_chunk) + \
+                " )"
+
+        ldc.search(ldapconnection.ldap_search_dn, query,
+                   attributes=list(dict.fromkeys(['uid'] + attributes)))
+
+        for entry in ldc.response:
+            if entry['type'] != 'searchResEntry':
+                continue
+
+            for uid in attribute_values(entry['attributes'], 'uid'):
+                if uid.lower() in lookup:
+                    entries[lookup[uid.lower()]] = entry['attributes']
+
+    return entries
+
+
+def resolve_uids(ldapconnection: LDAPConnection, uids: List[str],
+                 chunk: int = 50) -> Tuple[Dict[str, str], List[str]]:
+    """
+    Resolve NetIDs (``uid``) to ``uaid`` with
+    :func:`requiam.ldap_query.search_uids`
+
+    Usage:
+
+    .. highlight:: python
+    .. code-block:: python
+
+        uaid_dict, missing = ldap_query.resolve_uids(ldc, ['<netid1>', '<netid2>'])
+
+    :param ldapconnection: :class:`requiam.ldap_query.LDAPConnection` object
+    :param uids: NetID handles/usernames
+    :param chunk: Number of NetIDs per query. Default: 50
+
+    :return: ``dict`` of ``uid`` to ``uaid`` (in the order of ``uids``) and
+             list of ``uid`` that were not found
+    """
+
+    unique_uids = list(dict.fromkeys(uids))
+    entries = search_uids(ldapconnection, unique_uids, ['uaid'], chunk=chunk)
+
+    found = dict()
+    for uid, attributes in entries.items():
+        uaid = attribute_values(attributes, 'uaid')
+        if uaid:
+            found[uid] = uaid[0]
+
+    uaid_dict = {uid: found[uid] for uid in unique_uids if uid in found}
+    missing = [uid for uid in unique_uids if uid not in found]
+
+    return uaid_dict, missing
+
+
 def ual_grouper_base(basename: str) -> str:
     """
     Returns a string to use in LDAP queries that provide the Grouper
@@ -121,6 +327,48 @@ def ual_grouper_base(basename: str) -> str:
     return f"ismemberof=arizona.edu:dept:LBRY:pgrps:{basename}"
 
 
+def ual_pgrps_query(classification: str = 'all') -> str:
+    """
+    Construct the RFC 4512-compatible disjunction of UArizona Library patron
+    groups (``ismemberof``) for a classification. This is the part of
+    :func:`requiam.ldap_query.ual_ldap_query` that does not depend on the
+    organization code
+
+    Usage:
+
+    .. highlight:: python
+    .. code-block:: python
+
+        pgrps_query = ldap_query.ual_pgrps_query('faculty')
+        > '(| (ismemberof=arizona.edu:dept:LBRY:pgrps:ual-faculty) )'
+
+    :param classification: Input for classification. Default: 'all'.
+           Others: 'faculty', 'staff', 'students', 'dcc'
+
+    :raises ValueError: Incorrect ``classification``
+
+    :return: LDAP query
+    """
+
+    classification_list = ['all', 'faculty', 'staff', 'students', 'dcc']
+    if classification not in classification_list:
+        raise ValueError("Incorrect members input")
+
+    ldap_query = "(| "
+
+    if classification == 'all':
+        for member in classification_list[1:]:
+            group_str = ual_grouper_base(f"ual-{member}")
+            ldap_query += f"({group_str}) "
+    else:
+        group_str = ual_grouper_base(f"ual-{classification}")
+        ldap_query += f"({group_str}) "
+
+    ldap_query += ")"
+
+    return ldap_query
+
+
 def ual_ldap_query(org_code: str, classification: str = 'all') -> list:
     """
     Construct RFC 4512-compatible LDAP query to search for those with UArizona
@@ -149,26 +397,72 @@ def ual_ldap_query(org_code: str, classification: str = 'all') -> list:
     if classification == 'none':
         ldap_query = f"(employeePrimaryDept={org_code})"
     else:
-        ldap_query = f"(& (employeePrimaryDept={org_code}) (| "
+        pgrps_query = ual_pgrps_query(classification)
+        ldap_query = f"(& (employeePrimaryDept={org_code}) {pgrps_query} )"
 
-        classification_list = ['all', 'faculty', 'staff', 'students', 'dcc']
-        if classification not in classification_list:
-            raise ValueError("Incorrect members input")
+    return [ldap_query]
 
-        if classification == 'all':
-            for member in classification_list[1:]:
-                group_str = ual_grouper_base(f"ual-{member}")
-                ldap_query += f"({group_str}) "
+
+def org_code_queries(org_codes: List[str], base_query: str = '',
+                     max_length: int = 0) -> list:
+    """
+    Query planner that merges organizational codes into chunked
+    ``(| (employeePrimaryDept=a) (employeePrimaryDept=b) ...)`` disjunctions.
+    ``base_query`` is sent once per chunk. The union of the results is
+    identical to running one query per organizational code
+
+    Usage:
+
+    .. highlight:: python
+    .. code-block:: python
+
+       ldap_queries = ldap_query.org_code_queries(['0212', '0213'],
+                                                  ldap_query.ual_pgrps_query(),
+                                                  max_length=4000)
+
+    :param org_codes: Organizational codes
+    :param base_query: RFC 4512-compatible LDAP query to require for each
+           chunk. Default: No additional requirement
+    :param max_length: Maximum length of each LDAP query. A chunk always
+           includes at least one organizational code. Default: 0 (one query
+           per organizational code)
+
+    :return: List of LDAP queries
+    """
+
+    def _query(chunk: List[str]) -> str:
+        if len(chunk) == 1:
+            dept_query = f"(employeePrimaryDept={chunk[0]})"
         else:
-            group_str = ual_grouper_base(f"ual-{classification}")
-            ldap_query += f"({group_str}) "
+            dept_query = "(| " + \
+                         " ".join(f"(employeePrimaryDept={oc})" for oc in chunk) + \
+                         " )"
 
-        ldap_query += ") )"
+        if not base_query:
+            return dept_query
+        return f"(& {dept_query} {base_query} )"
 
-    return [ldap_query]
+    # Remove duplicates while preserving order
+    unique_codes = list(dict.fromkeys(org_codes))
 
+    if max_length <= 0:
+        return [_query([oc]) for oc in unique_codes]
 
-def ual_ldap_queries(org_codes: List[str]) -> list:
+    ldap_queries = []
+    chunk = []
+    for oc in unique_codes:
+        if chunk and len(_query(chunk + [oc])) > max_length:
+            ldap_queries.append(_query(chunk))
+            chunk = []
+        chunk.append(oc)
+
+    if chunk:
+        ldap_queries.append(_query(chunk))
+
+    return ldap_queries
+
+
+def ual_ldap_queries(org_codes: List[str], max_length: int = 0) -> list:
     """
     Construct *multiple* RFC 4512-compatible LDAP queries to search for
     those with UArizona Library privileges within multiple organizations
@@ -181,20 +475,119 @@ def ual_ldap_queries(org_codes: List[str]) -> list:
 
        ldap_queries = ldap_query.ual_ldap_queries(['0212','0213','0214'])
 
+       # Chunked OR queries, see :func:`requiam.ldap_query.org_code_queries`
+       ldap_queries = ldap_query.ual_ldap_queries(['0212','0213','0214'],
+                                                  max_length=4000)
+
     :param org_codes: Organizational codes
+    :param max_length: Maximum length of each chunked LDAP query.
+           Default: 0 (one query per organizational code)
 
     :return ldap_queries: list of str
     """
 
+    if max_length > 0:
+        return org_code_queries(org_codes, ual_pgrps_query(),
+                                max_length=max_length)
+
     ldap_queries = [ual_ldap_query(org_code)[0] for org_code in org_codes]
 
     return ldap_queries
 
 
-def ldap_search(ldapconnection: LDAPConnection, ldap_query: list) -> set:
+def ldap_search_paged(ldapconnection: LDAPConnection, query: str,
+                      paged_size: Optional[int] = None,
+                      ldc: Optional[ldap3.Connection] = None) -> Iterator[str]:
+    """
+    Run a single LDAP query with the Simple Paged Results control (RFC 2696)
+    and yield ``uaid`` values page by page. The raw response entries are
+    consumed as they arrive, so ``ldap3`` ``Entry`` objects are never built
+    and the server's size limit does not truncate the result
+
+    Usage:
+
+    .. highlight:: python
+    .. code-block:: python
+
+       members = set(ldap_query.ldap_search_paged(ldc, query, paged_size=500))
+
+    :param ldapconnection: :class:`requiam.ldap_query.LDAPConnection` object
+    :param query: RFC 4512-compatible LDAP query
+    :param paged_size: Number of entries per page.
+           Default: ``ldapconnection.ldap_paged_size``
+    :param ldc: ``ldap3`` ``Connection`` to search on. Default: ``ldapconnection.ldc``
+
+    :return: Generator of ``uaid`` values
+    """
+
+    if paged_size is None:
+        paged_size = ldapconnection.ldap_paged_size
+    if ldc is None:
+        ldc = ldapconnection.ldc
+
+    response = ldc.extend.standard.paged_search(ldapconnection.ldap_search_dn,
+                                                query, attributes=['uaid'],
+                                                paged_size=paged_size,
+                                                generator=True)
+
+    for entry in response:
+        if entry['type'] != 'searchResEntry':
+            continue
+
+        yield from attribute_values(entry['attributes'], 'uaid')
+
+
+def attribute_values(attributes: dict, name: str) -> list:
+    """
+    Return the values of an attribute from a raw ``ldap3`` response entry
+    as a list. Single-valued attributes are returned as a scalar by
+    ``ldap3`` when the server schema is known
+
+    :param attributes: ``attributes`` of an ``ldap3`` response entry
+    :param name: Attribute name
+
+    :return: Attribute values
+    """
+
+    values = attributes.get(name)
+    if isinstance(values, list):
+        return values
+    if values:
+        return [values]
+    return []
+
+
+def _search_single(ldapconnection: LDAPConnection, query: str,
+                   ldc: ldap3.Connection) -> set:
+    """Run a single LDAP query on ``ldc`` and return the set of ``uaid``"""
+
+    if ldapconnection.ldap_paged_size > 0:
+        return set(ldap_search_paged(ldapconnection, query, ldc=ldc))
+
+    ldc.search(ldapconnection.ldap_search_dn, query,
+               attributes=ldapconnection.ldap_attribs)
+
+    if ldc.result['description'] == 'sizeLimitExceeded':
+        ldapconnection.log.warning(f"Size limit exceeded, results truncated: {query}")
+        ldapconnection.log.warning("Set ldap_paged_size for paged searches")
+
+    return {e.uaid.value for e in ldc.entries}
+
+
+def ldap_search(ldapconnection: LDAPConnection, ldap_query: list,
+                as_array: bool = False) -> Members:
     """
     Queries a define LDAP connection and retrieve members
 
+    If ``ldapconnection.ldap_paged_size`` is set, each query is run through
+    :func:`requiam.ldap_query.ldap_search_paged`. If
+    ``ldapconnection.ldap_pool_size`` is larger than 1, the queries are
+    spread over a connection pool with
+    :meth:`requiam.ldap_query.LDAPConnection.search_many`. If
+    ``ldapconnection.incremental`` is set, only entries modified since the
+    last run are retrieved (see
+    :class:`requiam.ldap_incremental.IncrementalState`)
+
     Usage (see description in :class:`requiam.ldap_query.LDAPConnection`):
 
     .. highlight:: python
@@ -205,20 +598,388 @@ def ldap_search(ldapconnection: LDAPConnection, ldap_query: list) -> set:
     :param ldapconnection: An ``ldap3`` ``Connection`` from
            :class:`requiam.ldap_query.LDAPConnection`
     :param ldap_query: List of strings from :func:`requiam.ldap_query.ual_ldap_queries`
+    :param as_array: Return members as a compact array from
+           :func:`requiam.membership.to_member_array`. Default: ``False`` (set)
 
     :return: List of members
     """
 
-    ldap_search_dn = ldapconnection.ldap_search_dn
-    ldap_attribs = ldapconnection.ldap_attribs
+    if ldapconnection.incremental:
+        members = ldapconnection.incremental.search(ldapconnection, ldap_query)
+    else:
+        members = ldapconnection.search_many(ldap_query)
+
+    if as_array:
+        return to_member_array(members)
+    return members
+
+
+class AsyncLDAPConnection(LDAPConnection):
+    """
+    This class provides an asyncio-facing variant of
+    :class:`requiam.ldap_query.LDAPConnection` built on the ``ldap3`` ASYNC
+    strategy. Searches are sent on a single connection without waiting for
+    earlier responses, with at most ``max_outstanding`` message IDs in flight.
+    Use it with :func:`requiam.ldap_query.ldap_search_async` and
+    :func:`requiam.ldap_query.ldap_search_gather`
+
+    Usage:
+
+    .. highlight:: python
+    .. code-block:: python
+
+        import asyncio
+
+        aldc = ldap_query.AsyncLDAPConnection(eds_hostname, ldap_base_dn,
+                                              USERNAME, PASSWORD)
+
+        portal_queries = [ldap_query.ual_ldap_queries(['0404', '0413']),
+                          ldap_query.ual_ldap_queries(['0212'])]
+        portal_members = asyncio.run(ldap_query.ldap_search_gather(aldc,
+                                                                   portal_queries))
+
+    :param max_outstanding: Maximum number of outstanding LDAP message IDs.
+           Default: 8
+
+    See :class:`requiam.ldap_query.LDAPConnection` for other parameters
+
+    :ivar max_outstanding: Maximum number of outstanding LDAP message IDs
+    """
+
+    def __init__(self, *args, max_outstanding: int = 8, **kwargs) -> None:
+
+        self.max_outstanding = max_outstanding
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        super().__init__(*args, **kwargs)
+
+    def connect(self) -> ldap3.Connection:
+        """
+        Open and bind a new connection to the LDAP server with the ``ldap3``
+        ASYNC strategy
+
+        :return: Bound ``ldap3`` ``Connection``
+        """
+
+        return ldap3.Connection(self.ldap_bind_host, self.ldap_bind_dn,
+                                self.ldap_password, auto_bind=True,
+                                client_strategy=ldap3.ASYNC)
+
+    def search_many(self, queries: List[str], cache: bool = True) -> set:
+        """
+        Synchronous equivalent of :func:`requiam.ldap_query.ldap_search_async`
+        for callers of :meth:`requiam.ldap_query.LDAPConnection.search_many`.
+        Queries are sent with :func:`requiam.ldap_query.ldap_search_gather`
+        in a new event loop. Cached results from ``cache`` are used when
+        available
+
+        :param queries: List of RFC 4512-compatible LDAP queries
+        :param cache: Use and populate ``cache``. Default: ``True``
+
+        :raises TypeError: Called from a running event loop
+
+        :return: Set of ``uaid`` members
+        """
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return super().search_many(queries, cache=cache)
+
+        raise TypeError("AsyncLDAPConnection.search_many cannot be called from " +
+                        "a running event loop, use ldap_search_async")
+
+    def _search_queries(self, queries: List[str]) -> Iterator[set]:
+        """Yield the set of ``uaid`` for each query, in order"""
+
+        yield from asyncio.run(ldap_search_gather(self, [[query] for query in queries]))
+
+    async def search(self, query: str) -> set:
+        """
+        Run a single LDAP query and return the set of ``uaid``. Paged
+        results are requested when ``ldap_paged_size`` is set
+
+        :param query: RFC 4512-compatible LDAP query
+
+        :return: Set of ``uaid`` members
+        """
+
+        # Semaphore is bound to the running event loop
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_outstanding)
+            self._semaphore_loop = loop
+
+        members = set()
+        paged_kwargs = dict()
+        if self.ldap_paged_size > 0:
+            paged_kwargs['paged_size'] = self.ldap_paged_size
+
+        while True:
+            async with self._semaphore:
+                msgid = self.ldc.search(self.ldap_search_dn, query,
+                                        attributes=['uaid'], **paged_kwargs)
+                response, result = await loop.run_in_executor(
+                    None, self.ldc.get_response, msgid)
+
+            for entry in response:
+                if entry['type'] == 'searchResEntry':
+                    members.update(attribute_values(entry['attributes'], 'uaid'))
+
+            if not paged_kwargs:
+                break
+
+            try:
+                cookie = result['controls']['1.2.840.113556.1.4.319']['value']['cookie']
+            except KeyError:
+                cookie = None
+            if not cookie:
+                break
+            paged_kwargs['paged_cookie'] = cookie
+
+        return members
+
+
+async def ldap_search_async(ldapconnection: AsyncLDAPConnection,
+                            ldap_query: list) -> set:
+    """
+    Asyncio equivalent of :func:`requiam.ldap_query.ldap_search`. All
+    queries are issued at once and the results are merged
+
+    :param ldapconnection: :class:`requiam.ldap_query.AsyncLDAPConnection` object
+    :param ldap_query: List of strings from :func:`requiam.ldap_query.ual_ldap_queries`
+
+    :return: Set of ``uaid`` members
+    """
+
+    results = await asyncio.gather(*[ldapconnection.search(query)
+                                     for query in ldap_query])
+
+    return set().union(*results)
+
+
+async def ldap_search_gather(ldapconnection: AsyncLDAPConnection,
+                             ldap_queries: List[list]) -> List[set]:
+    """
+    Run :func:`requiam.ldap_query.ldap_search_async` for several groups
+    (e.g., all portals of a stage) at once
+
+    :param ldapconnection: :class:`requiam.ldap_query.AsyncLDAPConnection` object
+    :param ldap_queries: List of LDAP query lists, one per group
+
+    :return: List of sets of ``uaid`` members, in the order of ``ldap_queries``
+    """
+
+    return list(await asyncio.gather(*[ldap_search_async(ldapconnection, queries)
+                                       for queries in ldap_queries]))
+
+
+class EDSSnapshot:
+    """
+    This class pulls ``uaid``, ``uid``, ``employeePrimaryDept`` and the
+    Library patron group ``ismemberof`` values for the whole Library patron
+    population in one paged LDAP scan. It indexes the members by
+    organizational code and by classification so that the queries from
+    :func:`requiam.ldap_query.ual_ldap_query` and
+    :func:`requiam.quota.ual_ldap_quota_query` become set operations
+    without additional round trips
+
+    Note that only Library patrons are retrieved, so the ``'none'``
+    classification (all members of an organization) is not supported
+
+    Usage:
+
+    .. highlight:: python
+    .. code-block:: python
+
+        snapshot = ldap_query.EDSSnapshot(ldc)
+
+        members = snapshot.ual_ldap_queries(['0404', '0413', '0411'])
+        members = snapshot.quota_query('faculty')
+
+    :param ldapconnection: :class:`requiam.ldap_query.LDAPConnection` object
+    :param paged_size: Page size for the scan. Default:
+           ``ldapconnection.ldap_paged_size`` or 1000 if paging is disabled
+    :param log: File and/or stdout logging. Default: ``ldapconnection.log``
+
+    :ivar ldapconnection: :class:`requiam.ldap_query.LDAPConnection` object
+    :ivar paged_size: Page size for the scan
+    :ivar log: File and/or stdout logging
+    :ivar dict org_index: Organizational code to set of ``uaid``
+    :ivar dict class_index: Patron group basename (e.g., 'ual-faculty') to
+          set of ``uaid``
+    :ivar dict uid_index: ``uid`` (NetID) to ``uaid``
+    """
+
+    pgrps_basenames = ['ual-faculty', 'ual-staff', 'ual-students', 'ual-dcc',
+                       'ual-grads', 'ual-ugrads']
+
+    def __init__(self, ldapconnection: LDAPConnection,
+                 paged_size: Optional[int] = None,
+                 log: Optional[Logger] = None) -> None:
+
+        self.ldapconnection = ldapconnection
+
+        if paged_size is None:
+            paged_size = ldapconnection.ldap_paged_size or 1000
+        self.paged_size = paged_size
+
+        if isinstance(log, type(None)):
+            self.log = ldapconnection.log
+        else:
+            self.log = log
+
+        self.org_index: Dict[str, set] = dict()
+        self.class_index: Dict[str, set] = dict()
+        self.uid_index: Dict[str, str] = dict()
+
+        self.refresh()
+
+    def refresh(self) -> None:
+        """
+        Scan EDS for the Library patron population and rebuild the indexes
+        """
+
+        self.log.debug('entered')
+
+        pgrps_map = {ual_grouper_base(basename).split('=', 1)[1]: basename
+                     for basename in self.pgrps_basenames}
+
+        org_index: Dict[str, set] = dict()
+        class_index: Dict[str, set] = {basename: set() for
+                                       basename in self.pgrps_basenames}
+        uid_index: Dict[str, str] = dict()
+
+        query = "(| " + \
+                " ".join(f"({ual_grouper_base(basename)})"
+                         for basename in self.pgrps_basenames) + \
+                " )"
+
+        attributes = ['uaid', 'uid', 'employeePrimaryDept', 'ismemberof']
+
+        ldc = self.ldapconnection.ldc
+        response = ldc.extend.standard.paged_search(
+            self.ldapconnection.ldap_search_dn, query, attributes=attributes,
+            paged_size=self.paged_size, generator=True)
+
+        for entry in response:
+            if entry['type'] != 'searchResEntry':
+                continue
+
+            entry_attributes = entry['attributes']
+            uaid_values = attribute_values(entry_attributes, 'uaid')
+            if not uaid_values:
+                continue
+            uaid = uaid_values[0]
+
+            for uid in attribute_values(entry_attributes, 'uid'):
+                uid_index[uid] = uaid
+
+            for org_code in attribute_values(entry_attributes,
+                                             'employeePrimaryDept'):
+                org_index.setdefault(str(org_code), set()).add(uaid)
+
+            # Only retain Library patron groups
+            for group in attribute_values(entry_attributes, 'ismemberof'):
+                if group in pgrps_map:
+                    class_index[pgrps_map[group]].add(uaid)
+
+        self.org_index = org_index
+        self.class_index = class_index
+        self.uid_index = uid_index
+
+        self.log.info(f"EDS snapshot : {len(uid_index)} patrons, " +
+                      f"{len(org_index)} org codes")
+        self.log.debug('returning')
+
+    def classification_members(self, classification: str = 'all') -> set:
+        """
+        Return members of Library patron groups for a classification, as in
+        :func:`requiam.ldap_query.ual_pgrps_query`
+
+        :param classification: Input for classification. Default: 'all'.
+               Others: 'faculty', 'staff', 'students', 'dcc'
+
+        :raises ValueError: Incorrect ``classification``
+
+        :return: Set of ``uaid``
+        """
+
+        classification_list = ['faculty', 'staff', 'students', 'dcc']
+        if classification == 'all':
+            basenames = [f"ual-{member}" for member in classification_list]
+        elif classification in classification_list:
+            basenames = [f"ual-{classification}"]
+        else:
+            raise ValueError("Incorrect members input")
+
+        return set().union(*[self.class_index[basename] for
+                             basename in basenames])
+
+    def ual_ldap_query(self, org_code: str,
+                       classification: str = 'all') -> set:
+        """
+        Snapshot equivalent of :func:`requiam.ldap_query.ual_ldap_query`
+        followed by :func:`requiam.ldap_query.ldap_search`
+
+        :param org_code: Organizational code (e.g., '0212')
+        :param classification: Input for classification. Default: 'all'.
+               Others: 'faculty', 'staff', 'students', 'dcc'
+
+        :return: Set of ``uaid``
+        """
+
+        org_members = self.org_index.get(str(org_code), set())
+
+        return org_members & self.classification_members(classification)
+
+    def ual_ldap_queries(self, org_codes: List[str]) -> set:
+        """
+        Snapshot equivalent of :func:`requiam.ldap_query.ual_ldap_queries`
+        followed by :func:`requiam.ldap_query.ldap_search`
+
+        :param org_codes: Organizational codes
+
+        :return: Set of ``uaid``
+        """
+
+        org_members = set().union(*[self.org_index.get(str(org_code), set())
+                                    for org_code in org_codes])
+
+        return org_members & self.classification_members('all')
+
+    def quota_query(self, ual_class: str,
+                    org_codes: Optional[list] = None) -> Optional[set]:
+        """
+        Snapshot equivalent of :func:`requiam.quota.ual_ldap_quota_query`
+        followed by :func:`requiam.ldap_query.ldap_search`
+
+        :param ual_class: UA classification. Options are: "faculty" (for
+               faculty, staff, and DCCs), "grad", "ugrad"
+        :param org_codes: Org codes to require in search
+
+        :return: Set of ``uaid``
+        """
+
+        if ual_class not in ['faculty', 'grad', 'ugrad']:
+            self.log.warning("[ual_class] must either be 'faculty', 'grad', or 'ugrad'")
+            return
 
-    # Use of set for unique entries
-    all_members = set()
+        employees = self.class_index['ual-faculty'] | \
+            self.class_index['ual-staff'] | self.class_index['ual-dcc']
 
-    for query in ldap_query:
-        ldapconnection.ldc.search(ldap_search_dn, query, attributes=ldap_attribs)
+        if ual_class == 'faculty':
+            members = employees
+        if ual_class == 'grad':
+            members = self.class_index['ual-grads'] - employees
+        if ual_class == 'ugrad':
+            members = self.class_index['ual-ugrads'] - employees - \
+                self.class_index['ual-grads']
 
-        members = {e.uaid.value for e in ldapconnection.ldc.entries}
-        all_members = set.union(all_members, members)
+        if org_codes:
+            org_members = set().union(*[self.org_index.get(str(oc), set())
+                                        for oc in org_codes])
+            members = members & org_members
 
-    return all_members
+        return set(members)
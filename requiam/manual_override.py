@@ -1,8 +1,9 @@
 from logging import Logger
+from typing import Dict, List, Optional
 import pandas as pd
 from os.path import exists, join, islink, dirname
 
-from .ldap_query import LDAPConnection
+from .ldap_query import LDAPConnection, attribute_values, search_uids
 from .commons import figshare_stem
 from redata.commons.logger import log_stdout
 
@@ -296,6 +297,9 @@ def get_current_groups(uid: str, ldap_dict: dict, production: bool = False,
     """
     Retrieve current Figshare ``ismemberof`` association
 
+    For multiple users, use :func:`requiam.manual_override.get_current_groups_bulk`
+    to reuse a single connection
+
     :param uid: User NetID
     :param ldap_dict: LDAP settings
     :param production: Flag to indicate using Grouper production stem
@@ -315,13 +319,78 @@ def get_current_groups(uid: str, ldap_dict: dict, production: bool = False,
 
     mo_ldc.ldc.search(mo_ldc.ldap_search_dn, user_query, attributes=mo_ldc.ldap_attribs)
 
-    membership = mo_ldc.ldc.entries[0].ismemberof.value
+    membership = mo_ldc.ldc.entries[0].ismemberof.values
+
+    return parse_current_groups(uid, membership, production=production,
+                                log=log, verbose=verbose)
+
+
+def get_current_groups_bulk(ldapconnection: LDAPConnection, uids: List[str],
+                            production: bool = False,
+                            log: Logger = log_stdout(), verbose: bool = True,
+                            chunk: int = 50) -> Dict[str, dict]:
+    """
+    Retrieve current Figshare ``ismemberof`` association for multiple users
+    on an existing connection with :func:`requiam.ldap_query.search_uids`.
+    See :func:`requiam.manual_override.get_current_groups`
+
+    :param ldapconnection: :class:`requiam.ldap_query.LDAPConnection` object
+    :param uids: User NetIDs
+    :param production: Flag to indicate using Grouper production stem
+           (``figshare``) over test (``figtest``). Default: ``False``
+    :param log: File and/or stdout logging
+    :param verbose: Provide information about each user. Default: ``True``
+    :param chunk: Number of NetIDs per query. Default: 50
+
+    :raises ValueError: User is associated with multiple portal/quota groups
+
+    :return: ``dict`` of ``uid`` to dict containing current Figshare portal
+             and quota. Users that are not found are not included
+    """
+
+    unique_uids = list(dict.fromkeys(uids))
+    entries = search_uids(ldapconnection, unique_uids, ['ismemberof'],
+                          chunk=chunk)
+
+    figshare_dicts = dict()
+    for uid in unique_uids:
+        if uid not in entries:
+            log.warning(f"netid not found! {uid}")
+            continue
+
+        membership = attribute_values(entries[uid], 'ismemberof')
+        figshare_dicts[uid] = parse_current_groups(uid, membership,
+                                                   production=production,
+                                                   log=log, verbose=verbose)
+
+    return figshare_dicts
+
+
+def parse_current_groups(uid: str, membership: Optional[List[str]],
+                         production: bool = False,
+                         log: Logger = log_stdout(),
+                         verbose: bool = True) -> dict:
+    """
+    Identify current Figshare portal, quota and active association from
+    ``ismemberof`` values
+
+    :param uid: User NetID
+    :param membership: ``ismemberof`` values
+    :param production: Flag to indicate using Grouper production stem
+           (``figshare``) over test (``figtest``). Default: ``False``
+    :param log: File and/or stdout logging
+    :param verbose: Provide information about each user. Default: ``True``
+
+    :raises ValueError: User is associated with multiple portal/quota groups
+
+    :return figshare_dict: dict containing current Figshare portal and quota
+    """
 
     figshare_dict = dict()
 
     revert_command = f'--netid {uid} '
 
-    if isinstance(membership, type(None)):
+    if not membership:
         log.warning("No ismembersof attributes")
 
         figshare_dict['portal'] = 'root'
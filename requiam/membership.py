@@ -0,0 +1,137 @@
+from typing import Iterable, List, Union
+
+import numpy as np
+
+Members = Union[set, np.ndarray]
+
+# Largest number of digits that always fits in numpy.uint64
+max_uint64_digits = 19
+
+
+def to_member_array(members: Iterable[str]) -> np.ndarray:
+    """
+    Convert members to a compact, sorted and unique ``numpy`` array.
+    Fixed-width numeric IDs are stored as ``numpy.uint64`` (8 bytes per
+    member). Members that can not be represented exactly as integers
+    (e.g., leading zeros or letters) fall back to a fixed-width unicode array
+
+    Usage:
+
+    .. highlight:: python
+    .. code-block:: python
+
+        ldap_members = membership.to_member_array(ldap_members)
+
+    :param members: Set, list or array of member IDs
+
+    :return: Sorted array of unique member IDs
+    """
+
+    if isinstance(members, np.ndarray):
+        return members
+
+    members = list(members)
+    numeric = all(m.isdigit() and len(m) <= max_uint64_digits and
+                  (m == '0' or not m.startswith('0')) for m in members)
+
+    if numeric:
+        return np.unique(np.array(members, dtype=np.uint64))
+
+    return np.unique(np.array(members, dtype=str))
+
+
+def to_member_set(members: Members) -> set:
+    """
+    Convert members to a ``set`` of str
+
+    :param members: Set or array of member IDs
+
+    :return: Set of member IDs
+    """
+
+    if isinstance(members, np.ndarray):
+        return set(member_list(members))
+
+    return set(members)
+
+
+def member_list(members: Members) -> List[str]:
+    """
+    Convert members to a list of str, e.g. for Grouper ``subjectLookups``
+
+    :param members: Set or array of member IDs
+
+    :return: List of member IDs
+    """
+
+    if isinstance(members, np.ndarray):
+        return [str(m) for m in members.tolist()]
+
+    return list(members)
+
+
+def _as_arrays(a: Members, b: Members) -> tuple:
+    """Convert two member collections to arrays of the same dtype"""
+
+    a = to_member_array(a)
+    b = to_member_array(b)
+
+    if a.dtype != b.dtype:
+        a = a.astype(str)
+        b = b.astype(str)
+
+    return a, b
+
+
+def difference(a: Members, b: Members) -> Members:
+    """
+    Members in ``a`` but not in ``b``. Uses ``numpy.setdiff1d`` if either
+    input is an array
+
+    :param a: Set or array of member IDs
+    :param b: Set or array of member IDs
+
+    :return: Set or array of member IDs
+    """
+
+    if isinstance(a, set) and isinstance(b, set):
+        return a - b
+
+    a, b = _as_arrays(a, b)
+    return np.setdiff1d(a, b, assume_unique=True)
+
+
+def intersection(a: Members, b: Members) -> Members:
+    """
+    Members in both ``a`` and ``b``. Uses ``numpy.intersect1d`` if either
+    input is an array
+
+    :param a: Set or array of member IDs
+    :param b: Set or array of member IDs
+
+    :return: Set or array of member IDs
+    """
+
+    if isinstance(a, set) and isinstance(b, set):
+        return a & b
+
+    a, b = _as_arrays(a, b)
+    return np.intersect1d(a, b, assume_unique=True)
+
+
+def union(a: Members, b: Members) -> Members:
+    """
+    Members in either ``a`` or ``b``. Uses ``numpy.union1d`` if either
+    input is an array
+
+    :param a: Set or array of member IDs
+    :param b: Set or array of member IDs
+
+    :return: Set or array of member IDs
+    """
+
+    if isinstance(a, set) and isinstance(b, set):
+        return a | b
+
+    a, b = _as_arrays(a, b)
+    return np.union1d(a, b)
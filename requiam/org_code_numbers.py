@@ -1,4 +1,5 @@
 from logging import Logger
+from typing import Optional
 
 # For database/CSV
 import pandas as pd
@@ -6,14 +7,16 @@ import numpy as np
 from urllib.error import URLError
 
 # For LDAP query
-from .ldap_query import LDAPConnection, ual_grouper_base, ual_ldap_query, ldap_search
+from .ldap_query import LDAPConnection, EDSSnapshot, ual_grouper_base, \
+    ual_ldap_query, ldap_search
 
 from datetime import date
 
 today = date.today()
 
 
-def get_numbers(lc: LDAPConnection, org_url: str, log: Logger) -> None:
+def get_numbers(lc: LDAPConnection, org_url: str, log: Logger,
+                snapshot: Optional[EDSSnapshot] = None) -> None:
     """
     Determine number of individuals in each organization code with
     Library privileges and write to a file called "org_code_numbers.csv"
@@ -21,6 +24,8 @@ def get_numbers(lc: LDAPConnection, org_url: str, log: Logger) -> None:
     :param lc: LDAPConnection object for EDS record retrieval
     :param org_url: Google Docs URL that provides CSV
     :param log: File and/or stdout logging class
+    :param snapshot: :class:`requiam.ldap_query.EDSSnapshot` to answer
+           Library privileges queries from. Default: query EDS directly
 
     :raises URLError: Incorrect ``org_url``
     """
@@ -48,10 +53,16 @@ def get_numbers(lc: LDAPConnection, org_url: str, log: Logger) -> None:
         dcc_query     = [f"({ual_grouper_base('ual-dcc')})"]
 
         log.info("Getting faculty, staff, student, and dcc members ... ")
-        faculty_members = ldap_search(lc, faculty_query)
-        staff_members   = ldap_search(lc, staff_query)
-        student_members = ldap_search(lc, student_query)
-        dcc_members     = ldap_search(lc, dcc_query)
+        if snapshot:
+            faculty_members = snapshot.classification_members('faculty')
+            staff_members   = snapshot.classification_members('staff')
+            student_members = snapshot.classification_members('students')
+            dcc_members     = snapshot.classification_members('dcc')
+        else:
+            faculty_members = ldap_search(lc, faculty_query)
+            staff_members   = ldap_search(lc, staff_query)
+            student_members = ldap_search(lc, student_query)
+            dcc_members     = ldap_search(lc, dcc_query)
         log.info("Completed faculty, staff, student, and dcc queries")
 
         for org_code, ii in zip(org_codes, range(n_org_codes)):
@@ -61,7 +72,10 @@ def get_numbers(lc: LDAPConnection, org_url: str, log: Logger) -> None:
 
             total_members   = ldap_search(lc, ual_ldap_query(org_code,
                                                              classification='none'))
-            library_members = ldap_search(lc, ual_ldap_query(org_code))
+            if snapshot:
+                library_members = snapshot.ual_ldap_query(org_code)
+            else:
+                library_members = ldap_search(lc, ual_ldap_query(org_code))
 
             total[ii]       = len(total_members)
             lib_total[ii]   = len(library_members)
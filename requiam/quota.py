@@ -1,9 +1,10 @@
 from typing import Optional
-from .ldap_query import ual_grouper_base
+from .ldap_query import ual_grouper_base, org_code_queries
 
 
 def ual_ldap_quota_query(ual_class: str,
-                         org_codes: Optional[list] = None) -> Optional[list]:
+                         org_codes: Optional[list] = None,
+                         max_length: int = 0) -> Optional[list]:
     """
     Construct RFC 4512-compatible LDAP query to search for those within
     a UAL-based classification patron group
@@ -27,6 +28,10 @@ def ual_ldap_quota_query(ual_class: str,
            * "ugrad"   (for undergraduate students)
 
     :param org_codes: Org codes to require in search.
+    :param max_length: Maximum length of each chunked LDAP query when
+           ``org_codes`` is provided. See
+           :func:`requiam.ldap_query.org_code_queries`.
+           Default: 0 (one query per org code)
 
     :raises SystemExit: Incorrect ``ual_class`` input
 
@@ -64,6 +69,9 @@ def ual_ldap_quota_query(ual_class: str,
 
     # Filter by org codes
     if org_codes:
+        if max_length > 0:
+            return org_code_queries(org_codes, ldap_query,
+                                    max_length=max_length)
         return [f'(& (employeePrimaryDept={oc}) {ldap_query} )'
                 for oc in org_codes]
     else:
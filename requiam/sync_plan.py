@@ -0,0 +1,117 @@
+from datetime import datetime, timezone
+from logging import Logger
+from os import replace
+from typing import Any, Dict, List, Optional
+import gzip
+import json
+
+from redata.commons.logger import log_stdout
+
+from .delta import Delta
+from .membership import member_list
+
+
+class SyncPlan:
+    """
+    This class stores the adds, drops and summary of computed
+    :class:`requiam.delta.Delta` objects in a gzipped JSONL plan file, so
+    that synchronization can be reviewed and applied later without EDS
+    queries. The first line is a header and each following line is a group
+
+    Usage:
+
+    .. highlight:: python
+    .. code-block:: python
+
+        from requiam.sync_plan import SyncPlan
+
+        plan = SyncPlan('plan.jsonl.gz')
+        plan.add(d, portal, summary=summary_dict[portal], stage='portal')
+        plan.save(grouper_production=True)
+
+        # Later
+        for entry in SyncPlan('plan.jsonl.gz').load():
+            d = Delta.from_plan(entry, vars(ga), **delta_dict)
+            d.synchronize()
+
+    :param plan_file: Full path to gzipped JSONL plan file
+    :param log: File and/or stdout logging
+
+    :ivar plan_file: Full path to gzipped JSONL plan file
+    :ivar log: File and/or stdout logging
+    :ivar header: Plan header with creation time and Grouper stem
+    :ivar entries: Planned 'name', 'group', 'members_url', 'stage',
+          'summary', 'drops' and 'adds' of each group
+    """
+
+    def __init__(self, plan_file: str, log: Optional[Logger] = None) -> None:
+
+        if isinstance(log, type(None)):
+            self.log = log_stdout()
+        else:
+            self.log = log
+
+        self.plan_file = plan_file
+
+        self.header: Dict[str, Any] = dict()
+        self.entries: List[Dict[str, Any]] = []
+
+    def add(self, d: Delta, name: str,
+            summary: Optional[Dict[str, Any]] = None, stage: str = '') -> None:
+        """
+        Add the drops and adds of a group to the plan
+
+        :param d: :class:`requiam.delta.Delta` object
+        :param name: Portal or quota name, used as the summary index
+        :param summary: Summary data, e.g. from
+               :func:`requiam.commons.get_summary_dict`
+        :param stage: Stage name, e.g. 'portal' or 'quota'
+        """
+
+        self.entries.append({
+            'name': str(name),
+            'group': d.grouper_query_dict['grouper_group'],
+            'members_url': d.grouper_query_dict['grouper_members_url'],
+            'stage': stage,
+            'summary': summary if summary else dict(),
+            'drops': member_list(d.drops),
+            'adds': member_list(d.adds)
+        })
+
+    def save(self, grouper_production: bool = True) -> None:
+        """
+        Write the plan file
+
+        :param grouper_production: Bool for the production stem
+        """
+
+        self.header = {'type': 'header',
+                       'created': datetime.now(timezone.utc).isoformat(),
+                       'grouper_production': grouper_production,
+                       'groups': len(self.entries)}
+
+        tmp_file = f"{self.plan_file}.tmp"
+        with gzip.open(tmp_file, 'wt') as f:
+            f.write(json.dumps(self.header) + '\n')
+            for entry in self.entries:
+                f.write(json.dumps(entry) + '\n')
+        replace(tmp_file, self.plan_file)
+
+        n_changes = sum(len(e['adds']) + len(e['drops']) for e in self.entries)
+        self.log.info(f"Saved plan for {len(self.entries)} groups " +
+                      f"({n_changes} changes) : {self.plan_file}")
+
+    def load(self) -> List[Dict[str, Any]]:
+        """
+        Read the plan file
+
+        :return: List of planned groups
+        """
+
+        with gzip.open(self.plan_file, 'rt') as f:
+            self.header = json.loads(f.readline())
+            self.entries = [json.loads(line) for line in f if line.strip()]
+
+        self.log.info(f"Loaded plan for {len(self.entries)} groups, " +
+                      f"created {self.header.get('created')}")
+        return self.entries
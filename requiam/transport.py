@@ -0,0 +1,397 @@
+from collections import Counter, deque
+from logging import Logger
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from redata.commons.logger import log_stdout
+
+
+class TokenBucket:
+    """
+    This class provides a thread-safe token-bucket rate limiter.
+    Tokens are added at ``rate`` per second up to ``burst``, and
+    :meth:`acquire` blocks until a token is available
+
+    :param rate: Tokens per second. 0 disables rate limiting
+    :param burst: Maximum number of tokens. Default: 1
+
+    :ivar rate: Tokens per second
+    :ivar burst: Maximum number of tokens
+    :ivar float waited: Total time in seconds spent waiting for tokens
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = float(rate)
+        self.burst = max(int(burst), 1)
+
+        self.tokens: float = self.burst
+        self.updated: float = time.monotonic()
+        self.waited: float = 0.0
+
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self) -> None:
+        """
+        Take one token, waiting for it if needed
+        """
+
+        if not self.enabled:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst,
+                                  self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+                self.waited += wait
+            time.sleep(wait)
+
+
+# HTTP statuses retried for idempotent calls. Grouper WS returns 500 for
+# application errors (e.g., an EXCEPTION or INVALID_QUERY result code), which
+# would fail again, so it is not retried
+retry_statuses = [429, 502, 503, 504]
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    Raised when Grouper calls are refused by an open :class:`CircuitBreaker`
+    """
+
+
+class CircuitBreaker:
+    """
+    This class provides a thread-safe circuit breaker. The circuit opens
+    when the share of failures among the last ``window`` calls reaches
+    ``threshold``. Calls are refused while it is open. After ``cooldown``
+    seconds a single trial call is allowed, and its outcome closes or
+    re-opens the circuit
+
+    :param threshold: Share of failed calls that opens the circuit.
+           0 disables the circuit breaker. Default: 0.5
+    :param window: Number of recent calls considered. Default: 20
+    :param cooldown: Seconds before a trial call is allowed. Default: 60
+
+    :ivar threshold: Share of failed calls that opens the circuit
+    :ivar window: Number of recent calls considered
+    :ivar cooldown: Seconds before a trial call is allowed
+    :ivar int opened: Number of times the circuit opened
+    """
+
+    def __init__(self, threshold: float = 0.5, window: int = 20,
+                 cooldown: float = 60) -> None:
+        self.threshold = float(threshold)
+        self.window = window
+        self.cooldown = cooldown
+
+        self.outcomes: deque = deque(maxlen=window)
+        self.opened_at: Optional[float] = None
+        self.opened: int = 0
+        self._trial = False
+
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Check whether a call can be made
+
+        :return: ``False`` while the circuit is open
+        """
+
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self._trial and \
+                    time.monotonic() - self.opened_at >= self.cooldown:
+                self._trial = True
+                return True
+            return False
+
+    def record(self, success: bool) -> None:
+        """
+        Record the outcome of a call
+
+        :param success: Bool for a successful call
+        """
+
+        if self.threshold <= 0:
+            return
+
+        with self._lock:
+            if self.opened_at is not None:
+                if not self._trial:
+                    return
+                self._trial = False
+                if success:
+                    self.opened_at = None
+                    self.outcomes.clear()
+                else:
+                    self.opened_at = time.monotonic()
+                    self.opened += 1
+                return
+
+            self.outcomes.append(success)
+            n_failed = self.outcomes.count(False)
+            if len(self.outcomes) == self.window and \
+                    n_failed / self.window >= self.threshold:
+                self.opened_at = time.monotonic()
+                self.opened += 1
+
+
+class GrouperTransport:
+    """
+    This class provides a shared HTTP transport for Grouper Web Services.
+    It wraps a ``requests.Session`` with keep-alive connection pooling so
+    that repeated calls to the Grouper host reuse TLS connections
+
+    Usage:
+
+    .. highlight:: python
+    .. code-block:: python
+
+        from requiam.transport import GrouperTransport
+
+        transport = GrouperTransport((grouper_user, grouper_password),
+                                     pool_size=10, timeout=120)
+        rsp = transport.get(url)
+
+    :param auth: Grouper credential (username, password)
+    :param pool_size: Number of pooled connections per host. Default: 10
+    :param timeout: Default timeout in seconds for each call. Default: 120
+    :param log: File and/or stdout logging
+    :param rate_limit: Requests per second shared by all calls.
+           Default: 0 (unlimited)
+    :param rate_burst: Number of requests allowed in a burst. Default: 1
+    :param max_writes: Maximum number of concurrent write calls
+           (``write=True``). Default: 0 (unlimited)
+    :param max_retries: Maximum number of retries of idempotent calls after
+           a connection error, a timeout or a 429/502/503/504 status. A 500
+           status is a Grouper application error and is not retried.
+           Default: 3
+    :param backoff: Base delay in seconds for jittered exponential backoff.
+           Default: 1
+    :param deadline: Maximum time in seconds for a call, including retries.
+           Default: 600
+    :param breaker_threshold: Share of failed calls that opens the circuit
+           breaker. 0 disables it. Default: 0.5
+    :param breaker_cooldown: Seconds before a trial call is allowed by an
+           open circuit breaker. Default: 60
+
+    :ivar auth: Grouper credential
+    :ivar pool_size: Number of pooled connections per host
+    :ivar timeout: Default timeout in seconds for each call
+    :ivar log: File and/or stdout logging
+    :ivar session: ``requests.Session`` shared by all calls
+    :ivar limiter: :class:`TokenBucket` shared by all calls
+    :ivar max_writes: Maximum number of concurrent write calls
+    :ivar max_retries: Maximum number of retries of idempotent calls
+    :ivar backoff: Base delay in seconds for exponential backoff
+    :ivar deadline: Maximum time in seconds for a call, including retries
+    :ivar breaker: :class:`CircuitBreaker` shared by all calls
+    :ivar stats: ``Counter`` of requests, retries, failures, timeouts and
+          calls refused by the circuit breaker
+    """
+
+    def __init__(self, auth: Tuple[str, str], pool_size: int = 10,
+                 timeout: int = 120, log: Optional[Logger] = None,
+                 rate_limit: float = 0, rate_burst: int = 1,
+                 max_writes: int = 0, max_retries: int = 3,
+                 backoff: float = 1, deadline: float = 600,
+                 breaker_threshold: float = 0.5,
+                 breaker_cooldown: float = 60) -> None:
+
+        if isinstance(log, type(None)):
+            self.log = log_stdout()
+        else:
+            self.log = log
+
+        self.auth = auth
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.auth = auth
+
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.limiter = TokenBucket(rate_limit, rate_burst)
+        self.max_writes = max_writes
+        self._write_semaphore: Optional[threading.BoundedSemaphore] = \
+            threading.BoundedSemaphore(max_writes) if max_writes > 0 else None
+
+        self.max_retries = max_retries
+        self.backoff = float(backoff)
+        self.deadline = deadline
+        self.breaker = CircuitBreaker(threshold=breaker_threshold,
+                                      cooldown=breaker_cooldown)
+
+        self.stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+
+    def request(self, method: str, url: str,
+                timeout: Optional[int] = None, write: bool = False,
+                idempotent: Optional[bool] = None,
+                on_attempt: Optional[Callable[[float, Optional[int]], None]] = None,
+                **kwargs) -> requests.Response:
+        """
+        Send an HTTP request on the pooled session, within the rate limit.
+        Idempotent calls are retried with jittered exponential backoff
+        until ``max_retries`` or ``deadline`` is reached
+
+        :param method: HTTP method (e.g., 'GET', 'POST', 'PUT')
+        :param url: Full URL
+        :param timeout: Timeout in seconds for each attempt.
+               Default: ``self.timeout``
+        :param write: Bool to count the call against ``max_writes``
+               (e.g., member, group and privilege updates). Default: ``False``
+        :param idempotent: Bool to allow retries.
+               Default: ``True`` for GET and PUT
+        :param on_attempt: Called after each attempt with its time in seconds
+               and its HTTP status, ``None`` if no response was received.
+               Default: ``None``
+        :param kwargs: Additional arguments for ``requests.Session.request``
+
+        :raises CircuitOpenError: If the circuit breaker is open
+        :raises requests.exceptions.RequestException: If the last attempt
+                fails with a connection error or a timeout, or any attempt
+                fails with another request error
+
+        :return: HTTP response
+        """
+
+        if timeout is None:
+            timeout = self.timeout
+        if idempotent is None:
+            idempotent = method in ['GET', 'PUT']
+        max_retries = self.max_retries if idempotent else 0
+
+        stop_t = time.monotonic() + self.deadline
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self._count('rejected')
+                raise CircuitOpenError(f"Grouper circuit breaker is open: {method} {url}")
+
+            remaining = stop_t - time.monotonic()
+            self._count('requests')
+            attempt_t = time.monotonic()
+            try:
+                rsp = self._send(method, url, min(timeout, max(remaining, 1)),
+                                 write, **kwargs)
+                error = None
+                retryable = rsp.status_code in retry_statuses
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout) as err:
+                if isinstance(err, requests.exceptions.Timeout):
+                    self._count('timeouts')
+                rsp = None
+                error = err
+                retryable = True
+            except Exception:
+                # Not retried, but the outcome still has to end a trial call
+                self.breaker.record(False)
+                self._count('failures')
+                if on_attempt:
+                    on_attempt(time.monotonic() - attempt_t, None)
+                raise
+
+            if on_attempt:
+                on_attempt(time.monotonic() - attempt_t,
+                           rsp.status_code if rsp is not None else None)
+
+            self.breaker.record(not retryable)
+            if not retryable:
+                return rsp
+
+            self._count('failures')
+            delay = random.uniform(0, self.backoff * 2 ** attempt)
+            if attempt >= max_retries or \
+                    time.monotonic() + delay >= stop_t:
+                if error is not None:
+                    raise error
+                return rsp
+
+            attempt += 1
+            self._count('retries')
+            reason = error if error is not None else f"status {rsp.status_code}"
+            self.log.warning(f"Grouper {method} failed ({reason}), " +
+                             f"retry {attempt}/{max_retries} in {delay:.1f} seconds")
+            # Release the pooled connection of a streamed response
+            if rsp is not None:
+                rsp.close()
+            time.sleep(delay)
+
+    def _send(self, method: str, url: str, timeout: float, write: bool,
+              **kwargs) -> requests.Response:
+        if write and self._write_semaphore:
+            with self._write_semaphore:
+                self.limiter.acquire()
+                return self.session.request(method, url, timeout=timeout, **kwargs)
+
+        self.limiter.acquire()
+        return self.session.request(method, url, timeout=timeout, **kwargs)
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def summary(self) -> Dict[str, int]:
+        """
+        Return the counters of the transport
+
+        :return: Number of requests, retries, failures, timeouts, calls
+                 refused by the circuit breaker and circuit breaker openings
+        """
+
+        summary = {key: self.stats[key] for key in
+                   ['requests', 'retries', 'failures', 'timeouts', 'rejected']}
+        summary['breaker_opened'] = self.breaker.opened
+        return summary
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Send a GET request. See :meth:`request`
+        """
+
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """
+        Send a POST request. See :meth:`request`
+        """
+
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        """
+        Send a PUT request. See :meth:`request`
+        """
+
+        return self.request('PUT', url, **kwargs)
+
+    def close(self) -> None:
+        """
+        Close the pooled connections
+        """
+
+        self.session.close()
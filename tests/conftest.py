@@ -0,0 +1,131 @@
+import json
+import ldap3
+import pytest
+import requests
+
+from requiam import ldap_query
+from requiam.transport import TokenBucket
+
+ldap_base_dn = 'dc=eds,dc=arizona,dc=edu'
+
+mock_org_codes = ['0212', '0213', '0214', '0310', '0414']
+mock_classes = ['ual-faculty', 'ual-staff', 'ual-students', 'ual-dcc',
+                'ual-grads', 'ual-ugrads', None]
+
+
+def mock_entries(n_entries: int = 70) -> list:
+    """Construct EDS-like person entries for the mock directory"""
+
+    entries = []
+    for i in range(n_entries):
+        pgrps = mock_classes[i % len(mock_classes)]
+        ismemberof = ['arizona.edu:dept:LBRY:other']
+        if pgrps:
+            ismemberof.append(f'arizona.edu:dept:LBRY:pgrps:{pgrps}')
+        if i % 5 == 0:  # Overlapping patron groups
+            ismemberof.append('arizona.edu:dept:LBRY:pgrps:ual-grads')
+        if i % 4 == 0:  # Figshare groups on the figtest stem
+            ismemberof += ['arizona.edu:dept:LBRY:figtest:active',
+                           'arizona.edu:dept:LBRY:figtest:portal:sci_math',
+                           'arizona.edu:dept:LBRY:figtest:quota:2147483648']
+
+        entries.append({'uid': f'netid{i:03d}',
+                        'uaid': f'{100000 + i}',
+                        'employeePrimaryDept': mock_org_codes[i % len(mock_org_codes)],
+                        'ismemberof': ismemberof,
+                        'modifyTimestamp': '20200101000000Z',
+                        'objectClass': 'person'})
+    return entries
+
+
+class MockLDAPConnection(ldap_query.LDAPConnection):
+    """LDAPConnection bound to an in-memory ldap3 MOCK_SYNC directory"""
+
+    def connect(self) -> ldap3.Connection:
+        ldc = ldap3.Connection(self.mock_server,
+                               client_strategy=ldap3.MOCK_SYNC)
+        ldc.bind()
+        return ldc
+
+
+class MockAsyncLDAPConnection(ldap_query.AsyncLDAPConnection):
+    """AsyncLDAPConnection bound to an in-memory ldap3 MOCK_ASYNC directory"""
+
+    def connect(self) -> ldap3.Connection:
+        ldc = ldap3.Connection(MockLDAPConnection.mock_server,
+                               client_strategy=ldap3.MOCK_ASYNC)
+        ldc.bind()
+        return ldc
+
+
+@pytest.fixture
+def mock_ldc():
+    server = ldap3.Server('mock_eds')
+    MockLDAPConnection.mock_server = server
+
+    ldc = MockLDAPConnection('mock_eds', ldap_base_dn, 'figshare', 'mock')
+    for entry in mock_entries():
+        ldc.ldc.strategy.add_entry(f"uid={entry['uid']},{ldc.ldap_search_dn}",
+                                   entry)
+
+    return ldc
+
+
+@pytest.fixture
+def mock_async_ldc(mock_ldc):
+    return MockAsyncLDAPConnection('mock_eds', ldap_base_dn, 'figshare',
+                                   'mock', max_outstanding=2)
+
+
+class FakeResponse:
+    """Minimal requests.Response stand-in for Grouper WS calls"""
+
+    def __init__(self, json_dict: dict, status_code: int = 200):
+        self.json_dict = json_dict
+        self.status_code = status_code
+        self.closed = False
+
+    def json(self) -> dict:
+        return self.json_dict
+
+    def iter_content(self, chunk_size: int = 1):
+        content = json.dumps(self.json_dict).encode()
+        for i in range(0, len(content), chunk_size):
+            yield content[i:i + chunk_size]
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error", response=self)
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class FakeTransport:
+    """
+    GrouperTransport stand-in that records calls and answers them with
+    ``handler(method, url, kwargs)``, a JSON ``dict`` or a ``FakeResponse``
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.calls = []
+        self.limiter = TokenBucket(0)
+
+    def request(self, method: str, url: str, on_attempt=None,
+                **kwargs) -> FakeResponse:
+        self.calls.append((method, url, kwargs))
+        rsp = self.handler(method, url, kwargs)
+        rsp = rsp if isinstance(rsp, FakeResponse) else FakeResponse(rsp)
+        if on_attempt:
+            on_attempt(0.0, rsp.status_code)
+        return rsp
+
+    def get(self, url: str, **kwargs) -> FakeResponse:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> FakeResponse:
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> FakeResponse:
+        return self.request('PUT', url, **kwargs)
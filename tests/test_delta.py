@@ -0,0 +1,261 @@
+import json
+import threading
+import time
+
+from requiam.delta import Delta, AdaptiveBatchSize
+from requiam import membership
+
+from .conftest import FakeResponse, FakeTransport
+
+delta_dict = {'batch_size': 2, 'batch_timeout': 10, 'batch_delay': 0,
+              'sync_max': 100}
+
+ldap_set = {'100001', '100002', '100003', '100004'}
+grouper_set = {'100003', '100004', '100005'}
+
+
+def test_Delta():
+
+    d = Delta(ldap_members=ldap_set,
+              grouper_query_dict={'members': grouper_set}, **delta_dict)
+
+    assert d.adds == {'100001', '100002'}
+    assert d.drops == {'100005'}
+    assert d.common == {'100003', '100004'}
+
+    # Compact arrays give the same result
+    d_arr = Delta(ldap_members=membership.to_member_array(ldap_set),
+                  grouper_query_dict={'members':
+                                      membership.to_member_array(grouper_set)},
+                  **delta_dict)
+
+    assert membership.to_member_set(d_arr.adds) == d.adds
+    assert membership.to_member_set(d_arr.drops) == d.drops
+    assert membership.to_member_set(d_arr.common) == d.common
+
+
+def test_Delta_synchronize_concurrent():
+
+    lock = threading.Lock()
+    state = {'in_flight': 0, 'max_in_flight': 0, 'order': []}
+
+    def handler(method, url, kwargs):
+        with lock:
+            state['in_flight'] += 1
+            state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+            state['order'].append(method)
+        time.sleep(0.02)
+        with lock:
+            state['in_flight'] -= 1
+
+        key = 'WsDeleteMemberResults' if method == 'POST' else 'WsAddMemberResults'
+        return {key: {'resultMetadata': {'resultCode': 'SUCCESS'}}}
+
+    ldap_members = {f'2{i:05}' for i in range(12)}
+    grouper_members = {f'3{i:05}' for i in range(8)}
+    transport = FakeTransport(handler)
+
+    d = Delta(ldap_members=ldap_members,
+              grouper_query_dict={'members': grouper_members,
+                                  'grouper_group': 'figtest:test',
+                                  'grouper_members_url': 'figtest:test/members',
+                                  'transport': transport},
+              **delta_dict, max_in_flight=3)
+    d.synchronize()
+
+    # 4 drop batches before 6 add batches
+    assert state['order'] == ['POST'] * 4 + ['PUT'] * 6
+    assert state['max_in_flight'] == 3
+
+    subjects = [s['subjectId'] for call in transport.calls if call[0] == 'PUT'
+                for s in json.loads(call[2]['data'])['WsRestAddMemberRequest']['subjectLookups']]
+    assert sorted(subjects) == sorted(ldap_members)
+
+
+def test_AdaptiveBatchSize():
+
+    sizer = AdaptiveBatchSize(400, 100, 600, target_time=10, increase=100)
+
+    sizer.record(400, 5, True)
+    assert sizer.next_size() == 500
+    sizer.record(500, 5, True)
+    sizer.record(600, 5, True)
+    assert sizer.next_size() == 600  # max_size
+
+    sizer.record(600, 20, True)  # slow
+    assert sizer.next_size() == 300
+    sizer.record(300, 1, False)  # failed
+    assert sizer.next_size() == 150
+    sizer.record(150, 1, False)
+    assert sizer.next_size() == 100  # min_size
+    assert sizer.sizes == [400, 500, 600, 600, 300, 150]
+
+
+def test_Delta_synchronize_adaptive():
+
+    def handler(method, url, kwargs):
+        key = 'WsDeleteMemberResults' if method == 'POST' else 'WsAddMemberResults'
+        return {key: {'resultMetadata': {'resultCode': 'SUCCESS'}}}
+
+    ldap_members = {f'2{i:05}' for i in range(20)}
+    transport = FakeTransport(handler)
+
+    d = Delta(ldap_members=ldap_members,
+              grouper_query_dict={'members': set(),
+                                  'grouper_group': 'figtest:test',
+                                  'grouper_members_url': 'figtest:test/members',
+                                  'transport': transport},
+              **delta_dict, batch_adaptive=True, batch_min_size=2,
+              batch_max_size=8)
+    d.synchronize()
+
+    assert d.batch_size_summary() == '2,4,6,8'
+    assert len(transport.calls) == 4
+
+
+def test_Delta_synchronize_adaptive_shared():
+
+    state = {'status': 200}
+
+    def handler(method, url, kwargs):
+        return FakeResponse({'WsAddMemberResults': {'resultMetadata': {'resultCode': 'SUCCESS'}}},
+                            status_code=state['status'])
+
+    transport = FakeTransport(handler)
+    settings = {**delta_dict, 'batch_adaptive': True, 'batch_min_size': 2,
+                'batch_max_size': 8}
+    sizer = AdaptiveBatchSize.from_settings(**settings)
+
+    def adaptive_delta(group, n_members):
+        return Delta(ldap_members={f'{group}{i:05}' for i in range(n_members)},
+                     grouper_query_dict={'members': set(),
+                                         'grouper_group': f'figtest:{group}',
+                                         'grouper_members_url': f'figtest:{group}/members',
+                                         'transport': transport,
+                                         'batch_sizer': sizer},
+                     **settings)
+
+    d = adaptive_delta(2, 6)
+    d.synchronize()
+    assert d.batch_size_summary() == '2,4'
+
+    # Size carries over to the next group
+    d = adaptive_delta(3, 14)
+    assert d.batch_sizer is sizer
+    d.synchronize()
+    assert d.batch_size_summary() == '6,8'
+
+    # Each unsuccessful attempt is recorded
+    state['status'] = 503
+    d = adaptive_delta(4, 1)
+    d.synchronize()
+    assert sizer.next_size() == 4
+    assert sizer.sizes == [2, 4, 6, 8, 1]
+
+
+def test_Delta_synchronize_retry_failed():
+
+    attempts = dict()
+
+    def handler(method, url, kwargs):
+        request = json.loads(kwargs['data'])['WsRestAddMemberRequest']
+        results = []
+        for lookup in request['subjectLookups']:
+            member = lookup['subjectId']
+            attempts[member] = attempts.get(member, 0) + 1
+            if member == '200001' and attempts[member] < 2:
+                code = 'PROBLEM'  # transient
+            elif member == '200002':
+                code = 'SUBJECT_NOT_FOUND'  # permanent
+            elif member == '200003':
+                code = 'EXCEPTION'  # persistent
+            else:
+                code = 'SUCCESS'
+            results.append({'wsSubject': {'id': member},
+                            'resultMetadata': {'resultCode': code}})
+        return {'WsAddMemberResults': {'results': results,
+                                       'resultMetadata': {'resultCode': 'PROBLEM'}}}
+
+    ldap_members = {f'2{i:05}' for i in range(8)}
+    transport = FakeTransport(handler)
+
+    d = Delta(ldap_members=ldap_members,
+              grouper_query_dict={'members': set(),
+                                  'grouper_group': 'figtest:test',
+                                  'grouper_members_url': 'figtest:test/members',
+                                  'transport': transport},
+              **{**delta_dict, 'batch_size': 4}, batch_retries=2,
+              batch_retry_size=1)
+    d.synchronize()
+
+    assert sorted(d.succeeded['add']) == sorted(ldap_members - {'200002', '200003'})
+    assert d.failed['add'] == {'200002': 'SUBJECT_NOT_FOUND',
+                               '200003': 'EXCEPTION'}
+    assert not d.synced
+
+    # Only failed members are re-sent, one per batch
+    assert attempts['200000'] == 1
+    assert attempts['200001'] == 2
+    assert attempts['200002'] == 1
+    assert attempts['200003'] == 3
+    assert d.batch_size_summary() == '4,4,1,1,1'
+
+
+def test_Delta_replace():
+
+    def handler(method, url, kwargs):
+        request = json.loads(kwargs['data'])
+        if method == 'PUT' and 'replaceAllExisting' in request['WsRestAddMemberRequest']:
+            code = state['replace_code']
+        else:
+            code = 'SUCCESS'
+        key = 'WsDeleteMemberResults' if method == 'POST' else 'WsAddMemberResults'
+        return {key: {'resultMetadata': {'resultCode': code}}}
+
+    grouper_members = {f'3{i:05}' for i in range(4)}
+    ldap_members = {'300000'} | {f'4{i:05}' for i in range(6)}
+
+    def replace_delta(**kwargs):
+        return Delta(ldap_members=ldap_members,
+                     grouper_query_dict={'members': grouper_members,
+                                         'grouper_group': 'figtest:test',
+                                         'grouper_members_url': 'figtest:test/members',
+                                         'transport': transport},
+                     **delta_dict, **kwargs)
+
+    # Small share of membership keeps batches
+    transport = FakeTransport(handler)
+    state = {'replace_code': 'SUCCESS'}
+    assert not replace_delta(replace_threshold=5).replace_ready()
+
+    # Unchanged members are in the replacing request, other adds follow
+    d = replace_delta(replace_threshold=0.5, replace_batch_size=3)
+    assert d.replace_ready()
+    d.synchronize()
+
+    assert [call[0] for call in transport.calls] == ['PUT', 'PUT', 'PUT']
+    replace_data = json.loads(transport.calls[0][2]['data'])['WsRestAddMemberRequest']
+    assert replace_data['replaceAllExisting'] == 'T'
+    replaced = [s['subjectId'] for s in replace_data['subjectLookups']]
+    assert replaced[0] == '300000'
+    assert len(replaced) == 3
+    assert d.batch_size_summary() == '3,3,1'
+    assert sorted(d.succeeded['drop']) == sorted(grouper_members - {'300000'})
+    assert sorted(d.succeeded['add']) == sorted(ldap_members - {'300000'})
+    assert d.synced
+
+    # Rejected replacement falls back to batches
+    transport = FakeTransport(handler)
+    state['replace_code'] = 'PROBLEM'
+    d = replace_delta(replace_threshold=0.5)
+    d.synchronize()
+
+    assert [call[0] for call in transport.calls] == ['PUT', 'POST', 'POST', 'PUT', 'PUT', 'PUT']
+    assert sorted(d.succeeded['add']) == sorted(ldap_members - {'300000'})
+
+    # Plans do not hold unchanged members
+    plan = {'group': 'figtest:test', 'members_url': 'figtest:test/members',
+            'drops': ['300001'], 'adds': ['400000']}
+    d = Delta.from_plan(plan, {'transport': transport}, **delta_dict,
+                        replace_threshold=0.5)
+    assert not d.replace_ready()
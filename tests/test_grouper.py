@@ -0,0 +1,427 @@
+import json
+import time
+
+import pytest
+import requests
+
+from requiam import grouper
+from requiam.grouper import Grouper, create_groups, grouper_delta_user, \
+    iter_subject_ids, superadmins, admins
+from requiam.delta import Delta
+from requiam.transport import GrouperTransport, TokenBucket
+
+from .conftest import FakeResponse, FakeTransport
+
+grouper_dict = {'grouper_host': 'grouper.iam.arizona.edu',
+                'grouper_base_path': 'grouper-ws/servicesRest/json/v2_5_001',
+                'grouper_user': 'figshare', 'grouper_password': 'mock'}
+
+delta_dict = {'batch_size': 2, 'batch_timeout': 10, 'batch_delay': 0,
+              'sync_max': 100}
+
+
+def members_handler(method, url, kwargs):
+    if method == 'GET':
+        return {'WsGetMembersLiteResult':
+                {'resultMetadata': {'resultCode': 'SUCCESS'},
+                 'wsSubjects': [{'id': '100003'}, {'id': '100004'}]}}
+
+    key = 'WsDeleteMemberResults' if method == 'POST' else 'WsAddMemberResults'
+    return {key: {'resultMetadata': {'resultCode': 'SUCCESS'}}}
+
+
+def test_Grouper_transport():
+
+    ga = Grouper(**grouper_dict, grouper_pool_size=4, grouper_timeout=30)
+    assert isinstance(ga.transport, GrouperTransport)
+    assert ga.transport.session.auth == ('figshare', 'mock')
+    assert ga.transport.timeout == 30
+
+    ga.transport = FakeTransport(members_handler)
+    query_dict = ga.query('arizona.edu:dept:LBRY:figtest:test')
+    assert query_dict['members'] == {'100003', '100004'}
+
+    # Query results are independent of the Grouper object
+    assert 'members' not in vars(ga)
+
+    # Delta shares the Grouper transport
+    d = Delta(ldap_members={'100001', '100002', '100003'},
+              grouper_query_dict=query_dict, **delta_dict)
+    assert d.transport is ga.transport
+
+    d.synchronize()
+    methods = [call[0] for call in ga.transport.calls]
+    assert methods == ['GET', 'POST', 'PUT']
+
+    put_data = json.loads(ga.transport.calls[-1][2]['data'])
+    subjects = put_data['WsRestAddMemberRequest']['subjectLookups']
+    assert sorted(s['subjectId'] for s in subjects) == ['100001', '100002']
+    assert ga.transport.calls[-1][2]['timeout'] == delta_dict['batch_timeout']
+
+
+def test_grouper_delta_user():
+
+    # Calls share the transport and rate limit of one Grouper
+    ga = Grouper(**grouper_dict)
+    ga.transport = FakeTransport(members_handler)
+    for netid, uaid in [('netid001', '100001'), ('netid002', '100002')]:
+        d = grouper_delta_user('sci_math', 'portal', netid, uaid, 'add',
+                               grouper_dict, delta_dict, sync=True,
+                               production=False, grouper=ga)
+        assert d.adds == {uaid}
+        assert d.transport is ga.transport
+
+    assert [call[0] for call in ga.transport.calls] == ['GET', 'PUT', 'GET', 'PUT']
+
+
+def test_iter_subject_ids():
+
+    rsp = {'WsGetMembersLiteResult':
+           {'resultMetadata': {'resultCode': 'SUCCESS'},
+            'wsSubjects': [{'id': f'1{i:05}', 'name': 'Wildcat, \u00e9 [x]'}
+                           for i in range(25)],
+            'subjectAttributeNames': ['name']}}
+    content = json.dumps(rsp, ensure_ascii=False).encode()
+
+    for chunk_size in [1, 3, 7, 64, len(content)]:
+        chunks = [content[i:i + chunk_size] for
+                  i in range(0, len(content), chunk_size)]
+        assert list(iter_subject_ids(chunks)) == [f'1{i:05}' for i in range(25)]
+
+        # Result metadata ahead of the subjects
+        metadata = dict()
+        assert len(list(iter_subject_ids(chunks, metadata=metadata))) == 25
+        assert metadata == {'resultCode': 'SUCCESS'}
+
+    # Result metadata after the subjects, with subject result codes
+    rsp_after = {'WsGetMembersLiteResult':
+                 {'wsSubjects': [{'id': '100000', 'resultCode': 'SUCCESS'}],
+                  'resultMetadata': {'resultCode': 'PROBLEM'}}}
+    content_after = json.dumps(rsp_after).encode()
+    for chunk_size in [1, 5, len(content_after)]:
+        metadata = dict()
+        chunks = [content_after[i:i + chunk_size] for
+                  i in range(0, len(content_after), chunk_size)]
+        assert list(iter_subject_ids(chunks, metadata=metadata)) == ['100000']
+        assert metadata == {'resultCode': 'PROBLEM'}
+
+    # No subjects
+    assert list(iter_subject_ids([b'{"WsGetMembersLiteResult": {}}'])) == []
+
+    # Truncated response
+    with pytest.raises(ValueError):
+        list(iter_subject_ids([content[:len(content) // 2]]))
+
+
+def test_Grouper_query_paged(monkeypatch):
+
+    all_members = [f'1{i:05}' for i in range(23)]
+
+    def paged_handler(method, url, kwargs):
+        params = kwargs['params']
+        start = (params['pageNumber'] - 1) * params['pageSize']
+        page = all_members[start:start + params['pageSize']]
+        return {'WsGetMembersLiteResult':
+                {'wsSubjects': [{'id': s} for s in page],
+                 'resultMetadata': {'resultCode': 'SUCCESS'}}}
+
+    monkeypatch.setattr(grouper, 'stream_chunk_size', 5)
+
+    ga = Grouper(**grouper_dict, grouper_page_size=10)
+    ga.transport = FakeTransport(paged_handler)
+    query_dict = ga.query('arizona.edu:dept:LBRY:figtest:test')
+    assert query_dict['members'] == set(all_members)
+    assert len(ga.transport.calls) == 3
+    assert all(call[2]['stream'] for call in ga.transport.calls)
+
+    # Paged members URL is unchanged for Delta
+    assert query_dict['grouper_members_url'].endswith('test/members')
+
+    # Exact multiple of the page size ends with an empty page
+    ga.transport = FakeTransport(paged_handler)
+    query_dict = ga.query('arizona.edu:dept:LBRY:figtest:test', page_size=23)
+    assert len(query_dict['members']) == 23
+    assert len(ga.transport.calls) == 2
+
+    # A server that ignores paging does not loop forever
+    def unpaged_handler(method, url, kwargs):
+        return {'WsGetMembersLiteResult':
+                {'resultMetadata': {'resultCode': 'SUCCESS'},
+                 'wsSubjects': [{'id': s} for s in all_members]}}
+
+    ga.transport = FakeTransport(unpaged_handler)
+    query_dict = ga.query('arizona.edu:dept:LBRY:figtest:test', page_size=10)
+    assert query_dict['members'] == set(all_members)
+    assert len(ga.transport.calls) == 2
+
+
+def test_Grouper_query_errors():
+
+    ga = Grouper(**grouper_dict)
+
+    # HTTP error status
+    ga.transport = FakeTransport(lambda method, url, kwargs:
+                                 FakeResponse({'error': 'unavailable'}, 503))
+    with pytest.raises(requests.HTTPError):
+        ga.query('arizona.edu:dept:LBRY:figtest:test')
+
+    # Grouper error body is not an empty group
+    ga.transport = FakeTransport(lambda method, url, kwargs:
+                                 {'WsRestResultProblem':
+                                  {'resultMetadata': {'resultCode': 'EXCEPTION'}}})
+    with pytest.raises(ValueError):
+        ga.query('arizona.edu:dept:LBRY:figtest:test')
+
+    # Empty group
+    ga.transport = FakeTransport(lambda method, url, kwargs:
+                                 {'WsGetMembersLiteResult':
+                                  {'resultMetadata': {'resultCode': 'SUCCESS'}}})
+    assert ga.query('arizona.edu:dept:LBRY:figtest:test')['members'] == set()
+
+
+def test_Grouper_query_many():
+
+    groups = [f'arizona.edu:dept:LBRY:figtest:portal:p{i}' for i in range(5)]
+
+    def many_handler(method, url, kwargs):
+        lookups = kwargs['json']['WsRestGetMembersRequest']['wsGroupLookups']
+        results = []
+        for lookup in lookups:
+            name = lookup['groupName']
+            if name.endswith('p3'):
+                results.append({'resultMetadata': {'resultCode': 'GROUP_NOT_FOUND'}})
+            else:
+                results.append({'wsGroup': {'name': name},
+                                'resultMetadata': {'resultCode': 'SUCCESS'},
+                                'wsSubjects': [{'id': name[-1] + '0001'}]})
+        return {'WsGetMembersResults': {'results': results}}
+
+    ga = Grouper(**grouper_dict, grouper_query_chunk=2)
+    ga.transport = FakeTransport(many_handler)
+    results = ga.query_many(groups)
+
+    assert len(ga.transport.calls) == 3
+    assert sorted(results) == [g for g in groups if not g.endswith('p3')]
+    assert results[groups[1]]['members'] == {'10001'}
+    assert results[groups[1]]['grouper_group'] == groups[1]
+    assert results[groups[1]]['grouper_members_url'].endswith('p1/members')
+    assert results[groups[1]]['transport'] is ga.transport
+
+    ga.transport = FakeTransport(many_handler)
+    results = ga.query_many(groups, as_array=True, chunk_size=10)
+    assert len(ga.transport.calls) == 1
+    assert list(results[groups[4]]['members']) == [40001]
+
+    # Results are matched on the group name
+    def reversed_handler(method, url, kwargs):
+        rsp = many_handler(method, url, kwargs)
+        rsp['WsGetMembersResults']['results'].reverse()
+        return rsp
+
+    ga.transport = FakeTransport(reversed_handler)
+    results = ga.query_many(groups[:3])
+    assert results[groups[0]]['members'] == {'00001'}
+    assert results[groups[2]]['members'] == {'20001'}
+
+    # Missing results raise
+    def missing_handler(method, url, kwargs):
+        rsp = many_handler(method, url, kwargs)
+        rsp['WsGetMembersResults']['results'].pop()
+        return rsp
+
+    ga.transport = FakeTransport(missing_handler)
+    with pytest.raises(ValueError):
+        ga.query_many(groups[:2])
+
+    # Groups with a full first page are streamed and paged with query()
+    def paged_handler(method, url, kwargs):
+        if method == 'GET':
+            params = kwargs['params']
+            start = (params['pageNumber'] - 1) * params['pageSize']
+            page = ['50001', '50002', '50003'][start:start + params['pageSize']]
+            return {'WsGetMembersLiteResult':
+                    {'resultMetadata': {'resultCode': 'SUCCESS'},
+                     'wsSubjects': [{'id': s} for s in page]}}
+        request = kwargs['json']['WsRestGetMembersRequest']
+        assert request['pageSize'] == '2'
+        rsp = many_handler(method, url, kwargs)
+        rsp['WsGetMembersResults']['results'][-1]['wsSubjects'] = \
+            [{'id': '50001'}, {'id': '50002'}]
+        return rsp
+
+    ga = Grouper(**grouper_dict, grouper_page_size=2)
+    ga.transport = FakeTransport(paged_handler)
+    results = ga.query_many(groups[:2])
+    assert results[groups[0]]['members'] == {'00001'}
+    assert results[groups[1]]['members'] == {'50001', '50002', '50003'}
+    assert [call[0] for call in ga.transport.calls] == ['POST', 'GET', 'GET']
+
+
+def test_Grouper_group_index():
+
+    stem_groups = [{'displayExtension': 'sci_math', 'uuid': 'abc123',
+                    'name': 'arizona.edu:dept:LBRY:figtest:portal:sci_math'}]
+
+    def stem_handler(method, url, kwargs):
+        if 'WsRestFindGroupsRequest' in kwargs['json']:
+            stem = kwargs['json']['WsRestFindGroupsRequest']['wsQueryFilter']['stemName']
+            if stem.endswith('quota'):
+                return {'WsFindGroupsResults': {}}
+            return {'WsFindGroupsResults': {'groupResults': stem_groups}}
+
+        # Group save
+        stem_groups.append({'displayExtension': 'sci_bio', 'uuid': 'def456',
+                            'name': 'arizona.edu:dept:LBRY:figtest:portal:sci_bio'})
+        return {'WsGroupSaveResults': {'resultMetadata': {'resultCode': 'SUCCESS'}}}
+
+    ga = Grouper(**grouper_dict)
+    ga.transport = FakeTransport(stem_handler)
+
+    assert ga.check_group_exists('sci_math', 'portal')
+    assert not ga.check_group_exists('sci_bio', 'portal')
+    assert len(ga.transport.calls) == 1
+
+    index = ga.get_group_index('portal')
+    assert index['uuid']['abc123']['displayExtension'] == 'sci_math'
+    assert 'arizona.edu:dept:LBRY:figtest:portal:sci_math' in index['name']
+
+    # Empty stem
+    with pytest.raises(KeyError):
+        ga.check_group_exists('2147483648', 'quota')
+
+    # Listing is downloaded again after add_group
+    assert ga.add_group('sci_bio', 'portal', 'Biology')
+    assert ga.check_group_exists('sci_bio', 'portal')
+    assert len(ga.transport.calls) == 4
+
+
+def test_create_groups_bulk():
+
+    stem_groups = [{'displayExtension': 'p0', 'uuid': 'uuid-p0',
+                    'name': 'arizona.edu:dept:LBRY:figtest:portal:p0'}]
+    saves = []
+
+    def save_handler(method, url, kwargs):
+        params = kwargs['json']
+        if 'WsRestFindGroupsRequest' in params:
+            return {'WsFindGroupsResults': {'groupResults': stem_groups}}
+
+        if 'WsRestGroupSaveRequest' in params:
+            to_saves = params['WsRestGroupSaveRequest']['wsGroupToSaves']
+            saves.append([g['wsGroup']['displayExtension'] for g in to_saves])
+            results = [{'wsGroup': {'name': g['wsGroup']['name']},
+                        'resultMetadata':
+                        {'resultCode': 'GROUP_NOT_FOUND' if g['wsGroup']['displayExtension'] == 'p4'
+                         else 'SUCCESS_INSERTED'}} for g in to_saves
+                       if g['wsGroup']['displayExtension'] != 'p3']
+            # Results are not in request order
+            results.reverse()
+            return {'WsGroupSaveResults': {'results': results,
+                                           'resultMetadata': {'resultCode': 'PROBLEM'}}}
+
+    ga = Grouper(**grouper_dict)
+    ga.transport = FakeTransport(save_handler)
+
+    groups = [f'p{i}' for i in range(5)]
+    descriptions = [f'Portal {i}' for i in range(5)]
+
+    # Dry run
+    create_groups(groups, 'portal', descriptions, ga, add=False)
+    assert not saves
+
+    result_codes = ga.add_groups(groups[1:], 'portal', descriptions[1:],
+                                 chunk_size=3)
+    assert saves == [['p1', 'p2', 'p3'], ['p4']]
+    assert result_codes == {'p1': 'SUCCESS_INSERTED', 'p2': 'SUCCESS_INSERTED',
+                            'p3': 'NO_RESULT', 'p4': 'GROUP_NOT_FOUND'}
+
+    # Index is downloaded again after saves
+    assert 'portal' not in ga.group_index
+
+
+def test_Grouper_add_privileges():
+
+    stem_groups = [{'displayExtension': f'p{i}', 'uuid': f'uuid-p{i}',
+                    'name': f'arizona.edu:dept:LBRY:figtest:portal:p{i}'}
+                   for i in range(3)]
+    access_uuids = {superadmins: 'uuid-super', admins: 'uuid-admin'}
+    assigns = []
+
+    def privilege_handler(method, url, kwargs):
+        params = kwargs['json']
+        if 'WsRestFindGroupsRequest' in params:
+            query_filter = params['WsRestFindGroupsRequest']['wsQueryFilter']
+            if 'groupName' in query_filter:
+                uuid = access_uuids[query_filter['groupName']]
+                return {'WsFindGroupsResults': {'groupResults': [{'uuid': uuid}]}}
+            return {'WsFindGroupsResults': {'groupResults': stem_groups}}
+
+        request = params['WsRestAssignGrouperPrivilegesRequest']
+        assigns.append(request)
+        results = [{'wsSubject': lookup, 'privilegeName': privilege,
+                    'resultMetadata': {'resultCode': 'SUCCESS_ALLOWED'}}
+                   for lookup in request['wsSubjectLookups']
+                   for privilege in request['privilegeNames']]
+        return {'WsAssignGrouperPrivilegesResults':
+                {'results': [{'wsSubject': {'id': r['wsSubject']['subjectId']},
+                              'resultMetadata': r['resultMetadata']} for r in results],
+                 'resultMetadata': {'resultCode': 'SUCCESS'}}}
+
+    ga = Grouper(**grouper_dict)
+    ga.transport = FakeTransport(privilege_handler)
+
+    access_privileges = {superadmins: 'admin',
+                         admins: ['read', 'view', 'optout']}
+    result_codes = ga.add_privileges(access_privileges, ['p0', 'p1', 'p5'],
+                                     'portal')
+
+    # One listing, two UUID lookups, two assignments per existing group
+    assert len(ga.transport.calls) == 1 + 2 + 4
+    assert ga.subject_uuids == access_uuids
+    assert result_codes['p0'] == {superadmins: 'SUCCESS_ALLOWED',
+                                  admins: 'SUCCESS_ALLOWED'}
+    assert result_codes['p5'][admins] == 'GROUP_NOT_FOUND'
+    assert assigns[1]['privilegeNames'] == ['read', 'view', 'optout']
+    assert assigns[1]['wsSubjectLookups'] == [{'subjectId': 'uuid-admin'}]
+
+    # UUIDs and stem listing are reused
+    create_groups(['p2'], 'portal', ['Portal 2'], ga, add=True)
+    assert len(ga.transport.calls) == 1 + 2 + 4 + 2
+
+    with pytest.raises(ValueError):
+        ga.add_privileges({admins: 'write'}, ['p0'], 'portal')
+
+
+def test_TokenBucket():
+
+    bucket = TokenBucket(0)
+    assert not bucket.enabled
+    bucket.acquire()
+
+    bucket = TokenBucket(50, burst=5)
+    start = time.monotonic()
+    for _ in range(15):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+
+    # First 5 from the burst, then 10 at 50 per second
+    assert 0.15 < elapsed < 1.0
+    assert bucket.waited > 0
+
+
+def test_GrouperTransport_limits():
+
+    ga = Grouper(**grouper_dict, grouper_rate_limit=20, grouper_rate_burst=2,
+                 grouper_max_writes=1)
+    assert ga.transport.limiter.rate == 20
+    assert ga.transport.max_writes == 1
+
+    # Delta batches are writes and do not use batch_delay with a rate limit
+    ga.transport = FakeTransport(members_handler)
+    ga.transport.limiter = TokenBucket(20, 2)
+    query_dict = ga.query('arizona.edu:dept:LBRY:figtest:test')
+    d = Delta(ldap_members={'100001', '100002', '100003'},
+              grouper_query_dict=query_dict,
+              **{**delta_dict, 'batch_delay': 60})
+    d.synchronize()
+    assert all(call[2]['write'] for call in ga.transport.calls[1:])
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import threading
+import time
+
+from requiam.delta import Delta
+from requiam.grouper import Grouper
+from requiam.grouper_async import AsyncGrouper
+
+from .conftest import FakeTransport
+from .test_grouper import grouper_dict, delta_dict
+
+
+class ConcurrencyCounter:
+    """Track the number of calls in flight in a FakeTransport handler"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def handler(self, method, url, kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.02)
+        with self.lock:
+            self.in_flight -= 1
+
+        if method == 'GET':
+            group = url.split('/')[-2]
+            return {'WsGetMembersLiteResult':
+                    {'resultMetadata': {'resultCode': 'SUCCESS'},
+                     'wsSubjects': [{'id': group[-1] + '00001'}]}}
+        key = 'WsDeleteMemberResults' if method == 'POST' else 'WsAddMemberResults'
+        return {key: {'resultMetadata': {'resultCode': 'SUCCESS'}}}
+
+
+def test_AsyncGrouper():
+
+    counter = ConcurrencyCounter()
+
+    ga = Grouper(**grouper_dict)
+    ga.transport = FakeTransport(counter.handler)
+    agc = AsyncGrouper(ga, max_concurrent=4, max_per_endpoint=3)
+
+    groups = [f'arizona.edu:dept:LBRY:figtest:portal:p{i}' for i in range(8)]
+    query_dicts = asyncio.run(agc.query_gather(groups))
+    assert [q['grouper_group'] for q in query_dicts] == groups
+    assert query_dicts[5]['members'] == {'500001'}
+
+    # Per-endpoint limit
+    assert 1 < counter.max_in_flight <= 3
+
+    # Drops complete before adds
+    deltas = [Delta(ldap_members={'a1', 'a2', 'a3', 'a4'},
+                    grouper_query_dict=q, **delta_dict) for q in query_dicts[:3]]
+    ga.transport.calls.clear()
+    asyncio.run(agc.synchronize_gather(deltas))
+
+    for d in deltas:
+        methods = [call[0] for call in ga.transport.calls
+                   if call[1] == d.grouper_query_dict['grouper_members_url']]
+        assert methods == ['POST', 'PUT', 'PUT']
+
+    agc.close()
+
+
+def test_AsyncGrouper_synchronize_failed():
+
+    attempts = dict()
+    lock = threading.Lock()
+
+    def handler(method, url, kwargs):
+        request = json.loads(kwargs['data'])['WsRestAddMemberRequest']
+        results = []
+        for lookup in request['subjectLookups']:
+            member = lookup['subjectId']
+            with lock:
+                attempts[member] = attempts.get(member, 0) + 1
+                n_attempt = attempts[member]
+            if member == '100006' and n_attempt == 1:
+                code = 'EXCEPTION'  # transient
+            elif member == '100007':
+                code = 'EXCEPTION'  # persistent
+            else:
+                code = 'SUCCESS'
+            results.append({'wsSubject': {'id': member},
+                            'resultMetadata': {'resultCode': code}})
+        return {'WsAddMemberResults': {'results': results,
+                                       'resultMetadata': {'resultCode': 'PROBLEM'}}}
+
+    ga = Grouper(**grouper_dict)
+    ga.transport = FakeTransport(handler)
+    agc = AsyncGrouper(ga, max_concurrent=4, max_per_endpoint=2)
+
+    ldap_members = {f'1{i:05}' for i in range(8)}
+    d = Delta(ldap_members=ldap_members,
+              grouper_query_dict={'members': set(),
+                                  'grouper_group': 'figtest:test',
+                                  'grouper_members_url': 'figtest:test/members',
+                                  'transport': ga.transport},
+              **{**delta_dict, 'batch_size': 4}, batch_adaptive=True,
+              batch_min_size=1, batch_max_size=4, batch_retries=2,
+              batch_retry_size=1)
+    asyncio.run(agc.synchronize(d))
+
+    # Failed members are retried and reported as with Delta.synchronize
+    assert attempts['100006'] == 2
+    assert attempts['100007'] == 3
+    assert d.failed['add'] == {'100007': 'EXCEPTION'}
+    assert sorted(d.succeeded['add']) == sorted(ldap_members - {'100007'})
+    assert not d.synced
+
+    # Adaptive batch sizes are used
+    assert sorted(d.batch_sizer.sizes) == sorted(d.batch_sizes)
+    assert d.batch_sizes[:2] == [4, 4]
+
+    agc.close()
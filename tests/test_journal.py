@@ -0,0 +1,80 @@
+import json
+
+import pytest
+
+from requiam.delta import Delta
+from requiam.journal import SyncJournal
+
+from .conftest import FakeTransport
+from .test_delta import delta_dict
+
+
+def test_SyncJournal(tmp_path):
+
+    journal = SyncJournal(str(tmp_path / 'sync_journal.jsonl'))
+    assert journal.pending() == []
+
+    journal.start()
+    journal.plan('figtest:portal:p0', 'p0/members', ['1', '2'], ['3', '4', '5'])
+    journal.plan('figtest:portal:p1', 'p1/members', [], ['6'])
+    journal.ack('figtest:portal:p0', 'drop', ['1', '2'])
+    journal.ack('figtest:portal:p0', 'add', ['4'])
+    journal.ack('figtest:portal:p1', 'add', ['6'])
+    journal.done('figtest:portal:p1')
+
+    # Partially written last record
+    with open(journal.journal_file, 'a') as f:
+        f.write('{"type": "ack", "group": "figtest:portal:p0", "act')
+
+    assert journal.pending() == [{'group': 'figtest:portal:p0',
+                                  'members_url': 'p0/members',
+                                  'drops': [], 'adds': ['3', '5']}]
+
+    # A new run discards earlier records
+    journal.start()
+    assert journal.pending() == []
+
+
+def test_Delta_journal_resume(tmp_path):
+
+    state = {'crash': True, 'n_adds': 0}
+
+    def handler(method, url, kwargs):
+        if method == 'PUT':
+            state['n_adds'] += 1
+            if state['crash'] and state['n_adds'] == 2:
+                raise RuntimeError('process killed')
+        key = 'WsDeleteMemberResults' if method == 'POST' else 'WsAddMemberResults'
+        return {key: {'resultMetadata': {'resultCode': 'SUCCESS'}}}
+
+    journal = SyncJournal(str(tmp_path / 'sync_journal.jsonl'))
+    journal.start()
+
+    grouper_query_dict = {'grouper_group': 'figtest:test',
+                          'grouper_members_url': 'figtest:test/members',
+                          'transport': FakeTransport(handler)}
+
+    d = Delta(ldap_members={'100001', '100002', '100003', '100004'},
+              grouper_query_dict={**grouper_query_dict, 'members': {'100005'}},
+              **delta_dict, journal=journal)
+    with pytest.raises(RuntimeError):
+        d.synchronize()
+
+    pending = journal.pending()
+    assert len(pending) == 1
+    assert pending[0]['drops'] == []
+    assert len(pending[0]['adds']) == 2
+
+    # Resume only sends the remaining batch
+    state['crash'] = False
+    transport = FakeTransport(handler)
+    d_resume = Delta.from_plan(pending[0], {**grouper_query_dict, 'transport': transport},
+                               **delta_dict, journal=journal)
+    assert d_resume.drops == set()
+    assert d_resume.adds == set(pending[0]['adds'])
+    d_resume.synchronize()
+
+    assert len(transport.calls) == 1
+    put_data = json.loads(transport.calls[0][2]['data'])
+    assert len(put_data['WsRestAddMemberRequest']['subjectLookups']) == 2
+    assert journal.pending() == []
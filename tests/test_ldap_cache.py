@@ -0,0 +1,50 @@
+from requiam import ldap_query
+from requiam.ldap_cache import LDAPCache
+
+search_dn = 'ou=people,dc=eds,dc=arizona,dc=edu'
+
+
+def test_LDAPCache(tmp_path):
+
+    cache = LDAPCache(str(tmp_path / 'ldap_cache.sqlite'), ttl=3600,
+                      max_entries=2)
+
+    # Whitespace around parentheses is normalized
+    key = cache.key('(& (uid=a) (uid=b) )', search_dn, ['uaid'])
+    assert key == cache.key('(&(uid=a)(uid=b))', search_dn, ['uaid'])
+    assert key != cache.key('(&(uid=a)(uid=b))', search_dn, ['ismemberof'])
+
+    assert cache.get(key) is None
+    cache.put(key, {'2', '1'})
+    assert cache.get(key) == {'1', '2'}
+
+    cache.put('empty', set())
+    assert cache.get('empty') == set()
+    assert cache.hits == 2
+    assert cache.misses == 1
+
+    # Least recently used entry is evicted
+    cache.put('third', {'3'})
+    assert cache.get(key) is None
+    assert cache.get('third') == {'3'}
+
+    # Expired entries are ignored
+    cache.ttl = -1
+    assert cache.get('third') is None
+
+    cache.clear()
+
+
+def test_search_many_cache(mock_ldc, tmp_path):
+
+    from .conftest import mock_org_codes
+
+    queries = ldap_query.ual_ldap_queries(mock_org_codes)
+    members = ldap_query.ldap_search(mock_ldc, queries)
+
+    mock_ldc.cache = LDAPCache(str(tmp_path / 'ldap_cache.sqlite'))
+    assert ldap_query.ldap_search(mock_ldc, queries) == members
+    assert mock_ldc.cache.misses == len(queries)
+
+    assert ldap_query.ldap_search(mock_ldc, queries) == members
+    assert mock_ldc.cache.hits == len(queries)
@@ -0,0 +1,100 @@
+from requiam import ldap_query
+from requiam.ldap_incremental import IncrementalState
+
+
+def test_IncrementalState(mock_ldc, tmp_path):
+
+    from .conftest import mock_org_codes
+
+    state_file = str(tmp_path / 'ldap_incremental.json.gz')
+    search_dn = mock_ldc.ldap_search_dn
+
+    queries = ldap_query.ual_ldap_queries(mock_org_codes[:3])
+    other_queries = ldap_query.ual_ldap_queries(mock_org_codes[3:])
+    full_members = ldap_query.ldap_search(mock_ldc, queries)
+
+    # First run is a full refresh
+    mock_ldc.incremental = IncrementalState(state_file)
+    assert ldap_query.ldap_search(mock_ldc, queries) == full_members
+    assert mock_ldc.incremental.changed is None
+    assert mock_ldc.incremental.is_touched(mock_ldc, queries)
+    ldap_query.ldap_search(mock_ldc, other_queries)
+    mock_ldc.incremental.commit(mock_ldc, queries)
+    mock_ldc.incremental.commit(mock_ldc, other_queries)
+    mock_ldc.incremental.save()
+
+    # Move one member out of the org codes and change another one
+    modified = {'modifyTimestamp': [('MODIFY_REPLACE', ['29990101000000Z'])]}
+    mock_ldc.ldc.modify(f'uid=netid000,{search_dn}',
+                        {'employeePrimaryDept': [('MODIFY_REPLACE', ['9999'])],
+                         **modified})
+    mock_ldc.ldc.modify(f'uid=netid001,{search_dn}', modified)
+
+    mock_ldc.incremental = None
+    expected = ldap_query.ldap_search(mock_ldc, queries)
+    assert expected == full_members - {'100000'}
+
+    mock_ldc.incremental = IncrementalState(state_file)
+    mock_ldc.incremental.begin(mock_ldc)
+    assert mock_ldc.incremental.changed == {'100000', '100001'}
+    assert ldap_query.ldap_search(mock_ldc, queries) == expected
+    assert mock_ldc.incremental.is_touched(mock_ldc, queries)
+
+    # Membership is unchanged for the other org codes
+    ldap_query.ldap_search(mock_ldc, other_queries)
+    assert not mock_ldc.incremental.is_touched(mock_ldc, other_queries)
+
+    # Changed manual overrides touch the group
+    other_members = ldap_query.ldap_search(mock_ldc, other_queries)
+    assert not mock_ldc.incremental.is_touched(mock_ldc, other_queries,
+                                               members=other_members)
+    assert mock_ldc.incremental.is_touched(mock_ldc, other_queries,
+                                           members=other_members | {'999999'})
+
+    # Groups that are not committed, e.g. refused by sync_max, are searched
+    # in full on the next run
+    mock_ldc.incremental.commit(mock_ldc, other_queries, members=other_members)
+    mock_ldc.incremental.save()
+
+    mock_ldc.incremental = IncrementalState(state_file)
+    mock_ldc.incremental.begin(mock_ldc)
+    assert mock_ldc.incremental.changed is not None
+    assert ldap_query.ldap_search(mock_ldc, queries) == expected
+    assert mock_ldc.incremental.is_touched(mock_ldc, queries)
+    ldap_query.ldap_search(mock_ldc, other_queries)
+    assert not mock_ldc.incremental.is_touched(mock_ldc, other_queries,
+                                               members=other_members)
+
+
+def test_IncrementalState_cache(mock_ldc, tmp_path):
+
+    from requiam.ldap_cache import LDAPCache
+    from .conftest import mock_org_codes
+
+    state_file = str(tmp_path / 'ldap_incremental.json.gz')
+    search_dn = mock_ldc.ldap_search_dn
+
+    queries = ldap_query.ual_ldap_queries(mock_org_codes[:3])
+
+    # Populate the cache before EDS changes
+    mock_ldc.cache = LDAPCache(str(tmp_path / 'ldap_cache.sqlite'))
+    full_members = ldap_query.ldap_search(mock_ldc, queries)
+
+    modified = {'modifyTimestamp': [('MODIFY_REPLACE', ['29990101000000Z'])]}
+    mock_ldc.ldc.modify(f'uid=netid000,{search_dn}',
+                        {'employeePrimaryDept': [('MODIFY_REPLACE', ['9999'])],
+                         **modified})
+    assert ldap_query.ldap_search(mock_ldc, queries) == full_members
+
+    # Incremental searches do not use or populate the cache
+    hits, misses = mock_ldc.cache.hits, mock_ldc.cache.misses
+    mock_ldc.incremental = IncrementalState(state_file)
+    assert ldap_query.ldap_search(mock_ldc, queries) == full_members - {'100000'}
+    mock_ldc.incremental.commit(mock_ldc, queries)
+    mock_ldc.incremental.save()
+
+    mock_ldc.incremental = IncrementalState(state_file)
+    mock_ldc.incremental.begin(mock_ldc)
+    assert mock_ldc.incremental.changed == {'100000'}
+    assert ldap_query.ldap_search(mock_ldc, queries) == full_members - {'100000'}
+    assert (mock_ldc.cache.hits, mock_ldc.cache.misses) == (hits, misses)
@@ -1,3 +1,5 @@
+import pytest
+
 from requiam import ldap_query
 
 org_codes = ['0414', '0310']
@@ -40,3 +42,158 @@ def test_ual_ldap_queries():
 
     assert isinstance(queries, list)
     assert len(queries) == len(org_codes)
+
+
+def test_ldap_search(mock_ldc):
+
+    queries = ldap_query.ual_ldap_queries(org_codes)
+
+    members = ldap_query.ldap_search(mock_ldc, queries)
+    assert isinstance(members, set)
+    assert len(members) > 0
+
+    # Paged search must return the same members
+    mock_ldc.ldap_paged_size = 3
+    paged_members = ldap_query.ldap_search(mock_ldc, queries)
+    assert paged_members == members
+
+    paged_generator = ldap_query.ldap_search_paged(mock_ldc, queries[0],
+                                                   paged_size=2)
+    assert set(paged_generator) <= members
+
+
+def test_org_code_queries():
+
+    codes = ['0212', '0213', '0214', '0212']
+
+    # Default is one query per unique org code
+    queries = ldap_query.org_code_queries(codes)
+    assert queries == [ldap_query.ual_ldap_query(oc, 'none')[0]
+                       for oc in codes[:3]]
+
+    base_query = ldap_query.ual_pgrps_query()
+    queries = ldap_query.org_code_queries(codes, base_query, max_length=300)
+    assert all(len(query) <= 300 for query in queries)
+    assert all(base_query in query for query in queries)
+
+    # A chunk always includes at least one org code
+    queries = ldap_query.org_code_queries(codes, base_query, max_length=10)
+    assert len(queries) == 3
+
+
+def test_ual_ldap_queries_chunked(mock_ldc):
+
+    from requiam.quota import ual_ldap_quota_query
+    from .conftest import mock_org_codes
+
+    per_code = ldap_query.ldap_search(mock_ldc,
+                                      ldap_query.ual_ldap_queries(mock_org_codes))
+
+    for max_length in [1, 300, 600, 10000]:
+        queries = ldap_query.ual_ldap_queries(mock_org_codes,
+                                              max_length=max_length)
+        assert ldap_query.ldap_search(mock_ldc, queries) == per_code
+
+        for ual_class in ['faculty', 'grad', 'ugrad']:
+            quota_per_code = ual_ldap_quota_query(ual_class,
+                                                  org_codes=mock_org_codes)
+            quota_chunked = ual_ldap_quota_query(ual_class,
+                                                 org_codes=mock_org_codes,
+                                                 max_length=max_length)
+            assert ldap_query.ldap_search(mock_ldc, quota_chunked) == \
+                ldap_query.ldap_search(mock_ldc, quota_per_code)
+
+    assert len(ldap_query.ual_ldap_queries(mock_org_codes,
+                                           max_length=10000)) == 1
+
+
+def test_search_many(mock_ldc):
+
+    from .conftest import mock_org_codes
+
+    queries = ldap_query.ual_ldap_queries(mock_org_codes)
+    serial_members = ldap_query.ldap_search(mock_ldc, queries)
+
+    mock_ldc.ldap_pool_size = 3
+    assert mock_ldc.search_many(queries) == serial_members
+    assert mock_ldc._pool.qsize() == 3
+
+    # ldap_search uses the pool transparently
+    assert ldap_query.ldap_search(mock_ldc, queries) == serial_members
+
+    # All pooled connections are unbound
+    pooled = list(mock_ldc._pool.queue)
+    mock_ldc.close()
+    assert mock_ldc._pool is None
+    assert not any(ldc.bound for ldc in pooled)
+
+
+def test_EDSSnapshot(mock_ldc):
+
+    from requiam.quota import ual_ldap_quota_query
+    from .conftest import mock_org_codes
+
+    snapshot = ldap_query.EDSSnapshot(mock_ldc, paged_size=5)
+    assert len(snapshot.uid_index) > 0
+
+    for org_code in mock_org_codes:
+        for ual_class in ['all', 'faculty', 'staff', 'students', 'dcc']:
+            query = ldap_query.ual_ldap_query(org_code, ual_class)
+            assert snapshot.ual_ldap_query(org_code, ual_class) == \
+                ldap_query.ldap_search(mock_ldc, query)
+
+    queries = ldap_query.ual_ldap_queries(mock_org_codes[:2])
+    assert snapshot.ual_ldap_queries(mock_org_codes[:2]) == \
+        ldap_query.ldap_search(mock_ldc, queries)
+
+    for ual_class in ['faculty', 'grad', 'ugrad']:
+        for codes in [None, mock_org_codes[1:3]]:
+            quota_query = ual_ldap_quota_query(ual_class, org_codes=codes)
+            assert snapshot.quota_query(ual_class, org_codes=codes) == \
+                ldap_query.ldap_search(mock_ldc, quota_query)
+
+    assert snapshot.quota_query('test') is None
+
+
+def test_ldap_search_async(mock_ldc, mock_async_ldc):
+
+    import asyncio
+    from .conftest import mock_org_codes
+
+    queries_list = [ldap_query.ual_ldap_queries([oc]) for oc in mock_org_codes]
+    expected = [ldap_query.ldap_search(mock_ldc, queries)
+                for queries in queries_list]
+
+    assert asyncio.run(ldap_query.ldap_search_gather(mock_async_ldc,
+                                                     queries_list)) == expected
+
+    # Paged results
+    mock_async_ldc.ldap_paged_size = 2
+    all_queries = ldap_query.ual_ldap_queries(mock_org_codes)
+    assert asyncio.run(ldap_query.ldap_search_async(mock_async_ldc, all_queries)) == \
+        ldap_query.ldap_search(mock_ldc, all_queries)
+
+    # Synchronous searches on the ASYNC strategy connection
+    assert ldap_query.ldap_search(mock_async_ldc, all_queries) == \
+        ldap_query.ldap_search(mock_ldc, all_queries)
+
+    async def search_in_loop():
+        return mock_async_ldc.search_many(all_queries)
+
+    with pytest.raises(TypeError):
+        asyncio.run(search_in_loop())
+
+
+def test_resolve_uids(mock_ldc):
+
+    uids = ['netid003', 'NETID001', 'netid003', 'unknown', 'netid010']
+
+    uaid_dict, missing = ldap_query.resolve_uids(mock_ldc, uids, chunk=2)
+
+    assert uaid_dict == {'netid003': '100003', 'NETID001': '100001',
+                         'netid010': '100010'}
+    assert list(uaid_dict.keys()) == ['netid003', 'NETID001', 'netid010']
+    assert missing == ['unknown']
+
+    for uid, uaid in uaid_dict.items():
+        assert ldap_query.ldap_search(mock_ldc, ldap_query.uid_query(uid)) == {uaid}
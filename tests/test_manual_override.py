@@ -60,3 +60,22 @@ def test_ManualOverride():
     new_ldap_set = mo.identify_changes(ldap_set, 'astro', 'portal')
     assert len(new_ldap_set) == len(ldap_set) - 2
 
+
+def test_get_current_groups_bulk(mock_ldc):
+
+    uids = ['netid000', 'netid001', 'unknown']
+    current = manual_override.get_current_groups_bulk(mock_ldc, uids,
+                                                      production=False,
+                                                      chunk=2)
+
+    assert list(current.keys()) == ['netid000', 'netid001']
+    assert current['netid000'] == {'active': True, 'portal': 'sci_math',
+                                   'quota': '2147483648'}
+    assert current['netid001'] == {'active': False, 'portal': 'root',
+                                   'quota': 'root'}
+
+    # Same parsing as the single-user version
+    membership = ['arizona.edu:dept:LBRY:figtest:portal:sci_math']
+    assert manual_override.parse_current_groups('netid002', membership) == \
+        {'active': False, 'portal': 'sci_math', 'quota': 'root'}
+    assert manual_override.parse_current_groups('netid002', None)['active'] is False
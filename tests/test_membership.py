@@ -0,0 +1,42 @@
+import numpy as np
+
+from requiam import membership
+
+ldap_set = {'100001', '100002', '100003', '100004'}
+grouper_set = {'100003', '100004', '100005'}
+
+
+def test_to_member_array():
+
+    arr = membership.to_member_array(ldap_set)
+    assert arr.dtype == np.uint64
+    assert membership.member_list(arr) == sorted(ldap_set)
+    assert membership.to_member_set(arr) == ldap_set
+
+    # IDs that are not exact integers are kept as strings
+    for members in [{'T123456789', '100001'}, {'0123', '100001'}]:
+        arr = membership.to_member_array(members)
+        assert arr.dtype.kind == 'U'
+        assert membership.to_member_set(arr) == members
+
+    assert len(membership.to_member_array(set())) == 0
+
+
+def test_set_operations():
+
+    ldap_arr = membership.to_member_array(ldap_set)
+    grouper_arr = membership.to_member_array(grouper_set)
+    mixed_arr = membership.to_member_array(grouper_set | {'T123456789'})
+
+    for a, b in [(ldap_set, grouper_set), (ldap_arr, grouper_arr),
+                 (ldap_arr, grouper_set), (ldap_set, mixed_arr)]:
+        b_set = membership.to_member_set(b)
+
+        result = membership.difference(a, b)
+        assert membership.to_member_set(result) == ldap_set - b_set
+
+        result = membership.intersection(a, b)
+        assert membership.to_member_set(result) == ldap_set & b_set
+
+        result = membership.union(a, b)
+        assert membership.to_member_set(result) == ldap_set | b_set
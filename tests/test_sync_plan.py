@@ -0,0 +1,51 @@
+import gzip
+import json
+
+from requiam.delta import Delta
+from requiam.commons import get_summary_dict
+from requiam.sync_plan import SyncPlan
+
+from .conftest import FakeTransport
+from .test_delta import delta_dict, ldap_set, grouper_set
+
+
+def test_SyncPlan(tmp_path):
+
+    def handler(method, url, kwargs):
+        key = 'WsDeleteMemberResults' if method == 'POST' else 'WsAddMemberResults'
+        return {key: {'resultMetadata': {'resultCode': 'SUCCESS'}}}
+
+    grouper_query_dict = {'grouper_group': 'figtest:portal:p0',
+                          'grouper_members_url': 'figtest:portal:p0/members',
+                          'members': grouper_set,
+                          'transport': FakeTransport(handler)}
+
+    d = Delta(ldap_members=ldap_set, grouper_query_dict=grouper_query_dict,
+              **delta_dict)
+
+    plan_file = str(tmp_path / 'plan.jsonl.gz')
+    plan = SyncPlan(plan_file)
+    plan.add(d, 'p0', summary=get_summary_dict(ldap_set, grouper_set, d),
+             stage='portal')
+    plan.save(grouper_production=False)
+
+    # Compressed JSONL with a header line
+    with gzip.open(plan_file, 'rt') as f:
+        lines = [json.loads(line) for line in f]
+    assert lines[0]['type'] == 'header'
+    assert lines[0]['groups'] == 1
+
+    entries = SyncPlan(plan_file).load()
+    assert len(entries) == 1
+    assert entries[0]['name'] == 'p0'
+    assert entries[0]['summary']['total'] == 3
+    assert set(entries[0]['drops']) == {'100005'}
+    assert set(entries[0]['adds']) == {'100001', '100002'}
+
+    # Apply without EDS or Grouper queries
+    transport = FakeTransport(handler)
+    d_apply = Delta.from_plan(entries[0], {'transport': transport}, **delta_dict)
+    assert d_apply.drops == d.drops
+    assert d_apply.adds == d.adds
+    d_apply.synchronize()
+    assert [call[0] for call in transport.calls] == ['POST', 'PUT']
@@ -0,0 +1,121 @@
+import pytest
+import requests
+
+from requiam.transport import GrouperTransport, CircuitBreaker, \
+    CircuitOpenError
+
+from .conftest import FakeResponse
+
+url = 'https://grouper.iam.arizona.edu/grouper-ws/groups'
+
+
+class FlakySession:
+    """Session stand-in that fails the first ``n_fail`` calls"""
+
+    def __init__(self, n_fail, error=None, status_code=503):
+        self.n_fail = n_fail
+        self.error = error
+        self.status_code = status_code
+        self.timeouts = []
+        self.responses = []
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        if len(self.timeouts) <= self.n_fail:
+            if self.error:
+                raise self.error
+            rsp = FakeResponse({}, status_code=self.status_code)
+        else:
+            rsp = FakeResponse({'result': 'ok'})
+        self.responses.append(rsp)
+        return rsp
+
+
+def flaky_transport(session, **kwargs):
+    transport = GrouperTransport(('figshare', 'mock'), backoff=0.001,
+                                 **kwargs)
+    transport.session = session
+    return transport
+
+
+def test_GrouperTransport_retry():
+
+    # Retried status, each attempt is reported
+    attempts = []
+    transport = flaky_transport(FlakySession(2))
+    rsp = transport.get(url, on_attempt=lambda t, status: attempts.append(status))
+    assert rsp.json() == {'result': 'ok'}
+    assert transport.summary()['retries'] == 2
+    assert transport.summary()['requests'] == 3
+    assert attempts == [503, 503, 200]
+
+    # Retried responses are closed, the returned one is not
+    assert [rsp.closed for rsp in transport.session.responses] == \
+        [True, True, False]
+
+    # Timeout is retried up to max_retries and re-raised
+    transport = flaky_transport(FlakySession(5, error=requests.exceptions.Timeout()),
+                                max_retries=2, breaker_threshold=0)
+    with pytest.raises(requests.exceptions.Timeout):
+        transport.get(url, timeout=5)
+    assert transport.summary()['timeouts'] == 3
+    assert transport.session.timeouts == [5, 5, 5]
+
+    # Non-idempotent calls are not retried
+    transport = flaky_transport(FlakySession(1))
+    rsp = transport.post(url)
+    assert rsp.status_code == 503
+    assert transport.summary()['retries'] == 0
+
+    # Other statuses are returned as is
+    transport = flaky_transport(FlakySession(1, status_code=500))
+    rsp = transport.get(url)
+    assert rsp.status_code == 500
+    assert transport.summary()['failures'] == 0
+
+
+def test_CircuitBreaker():
+
+    breaker = CircuitBreaker(threshold=0.5, window=4, cooldown=0)
+    for success in [True, False, True]:
+        breaker.record(success)
+    assert breaker.allow()
+
+    breaker.record(False)
+    assert breaker.opened == 1
+
+    # Single trial after the cooldown
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record(True)
+    assert breaker.allow()
+
+    transport = flaky_transport(FlakySession(100), max_retries=0,
+                                breaker_cooldown=60)
+    for _ in range(20):
+        transport.get(url)
+    with pytest.raises(CircuitOpenError):
+        transport.get(url)
+    assert transport.summary()['rejected'] == 1
+    assert transport.summary()['breaker_opened'] == 1
+
+
+def test_CircuitBreaker_trial_errors():
+
+    # A failed trial re-opens the circuit and is counted
+    breaker = CircuitBreaker(threshold=0.5, window=2, cooldown=0)
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.opened == 2
+
+    # A trial that fails with another request error ends the trial
+    transport = flaky_transport(FlakySession(21, error=requests.exceptions.ChunkedEncodingError()),
+                                max_retries=0, breaker_cooldown=0)
+    for _ in range(21):
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            transport.get(url)
+    assert transport.breaker.opened == 2
+    assert transport.get(url).json() == {'result': 'ok'}
+    assert transport.breaker.opened_at is None